@@ -0,0 +1,150 @@
+# admission.py
+import itertools
+import os
+import time
+from collections import OrderedDict
+
+from discord.ext import commands
+
+from metrics import metrics
+from rate_limit import TokenBucket
+
+BUSY_MESSAGE = "⏳ The bot is busy right now, try again in a few seconds."
+
+
+class CommandThrottled(commands.CheckFailure):
+    """Raised by the admission check; `reason` is "user", "guild" or "busy"."""
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Command throttled ({reason}), retry in {retry_after:.1f}s")
+
+    def user_message(self) -> str:
+        if self.reason == "user":
+            return f"🐢 Slow down! Try again in {max(1, round(self.retry_after))}s."
+        if self.reason == "guild":
+            return f"🐢 This server is sending a lot of commands, try again in {max(1, round(self.retry_after))}s."
+        return BUSY_MESSAGE
+
+
+class AdmissionControl:
+    """
+    Central admission control for every command.
+
+    Each invocation takes a token from its user's and its guild's bucket and
+    a slot from a global in-flight limit. Past `degrade_at` commands in flight
+    they are still admitted but marked cache-only (see cache_only()), so cogs
+    answer from their candidate pools instead of starting upstream calls; at
+    `max_inflight` new commands get a fast "busy" reply. Buckets are kept for
+    the `max_keys` most recently active users/guilds only.
+    """
+
+    def __init__(self, user_rate: float = 0.5, user_burst: int = 5, guild_rate: float = 5.0,
+                 guild_burst: int = 30, max_inflight: int = 64, degrade_at: int = 48,
+                 max_hold: float = 120.0, max_keys: int = 20000):
+        self.user_limit = (user_rate, user_burst)
+        self.guild_limit = (guild_rate, guild_burst)
+        self.max_inflight = max_inflight
+        self.degrade_at = degrade_at
+        # A slot never released (e.g. a cancelled invocation) is reclaimed after this long
+        self.max_hold = max_hold
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._held = {}
+        self._tokens = itertools.count(1)
+        self.counts = {"admitted": 0, "degraded": 0, "user": 0, "guild": 0, "busy": 0}
+
+    def _bucket(self, key: tuple) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, capacity = self.user_limit if key[0] == "user" else self.guild_limit
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def inflight(self) -> int:
+        now = time.monotonic()
+        for token in [t for t, started in self._held.items() if now - started > self.max_hold]:
+            del self._held[token]
+        return len(self._held)
+
+    def _reject(self, reason: str, retry_after: float):
+        self.counts[reason] += 1
+        metrics.inc("admission_total", decision=reason)
+        raise CommandThrottled(reason, retry_after)
+
+    def admit(self, ctx) -> bool:
+        """
+        Admit `ctx` or raise CommandThrottled. Calling it again for the same
+        invocation (e.g. help checking every command) is a no-op.
+        """
+        if getattr(ctx, "cpg_admission", None) is not None:
+            return True
+        inflight = self.inflight()
+        if inflight >= self.max_inflight:
+            self._reject("busy", 1.0)
+        # Both buckets must have a token before either is charged, so a command
+        # rejected for its guild doesn't use up its user's budget (and vice versa).
+        # The user is reported first: one spammer hears "slow down", not "server busy".
+        buckets = []
+        author = getattr(ctx, "author", None)
+        if author is not None:
+            buckets.append(("user", self._bucket(("user", author.id))))
+        guild = getattr(ctx, "guild", None)
+        if guild is not None:
+            buckets.append(("guild", self._bucket(("guild", guild.id))))
+        for reason, bucket in buckets:
+            wait = bucket.delay()
+            if wait > 0:
+                self._reject(reason, wait)
+        for _, bucket in buckets:
+            bucket.try_acquire()
+
+        ctx.cpg_admission = next(self._tokens)
+        ctx.cpg_cache_only = inflight >= self.degrade_at
+        self._held[ctx.cpg_admission] = time.monotonic()
+        decision = "degraded" if ctx.cpg_cache_only else "admitted"
+        self.counts[decision] += 1
+        metrics.inc("admission_total", decision=decision)
+        return True
+
+    def release(self, ctx):
+        """Give back the invocation's in-flight slot; safe to call more than once."""
+        token = getattr(ctx, "cpg_admission", None)
+        if token:
+            self._held.pop(token, None)
+            ctx.cpg_admission = 0
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight(),
+            "max_inflight": self.max_inflight,
+            "degrade_at": self.degrade_at,
+            "buckets": len(self._buckets),
+            "decisions": dict(self.counts),
+        }
+
+
+def cache_only(ctx) -> bool:
+    """True when the bot is overloaded and this command should not call upstream APIs."""
+    return getattr(ctx, "cpg_cache_only", False)
+
+
+def get_admission(bot) -> AdmissionControl:
+    """Return the bot-wide AdmissionControl, creating it on first use."""
+    admission = getattr(bot, "admission", None)
+    if admission is None:
+        max_inflight = int(os.getenv("ADMISSION_MAX_INFLIGHT", "64"))
+        admission = bot.admission = AdmissionControl(
+            user_rate=float(os.getenv("ADMISSION_USER_RATE", "0.5")),
+            user_burst=int(os.getenv("ADMISSION_USER_BURST", "5")),
+            guild_rate=float(os.getenv("ADMISSION_GUILD_RATE", "5")),
+            guild_burst=int(os.getenv("ADMISSION_GUILD_BURST", "30")),
+            max_inflight=max_inflight,
+            degrade_at=int(os.getenv("ADMISSION_DEGRADE_AT", str(max_inflight * 3 // 4))),
+        )
+    return admission
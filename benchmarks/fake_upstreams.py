@@ -0,0 +1,178 @@
+# benchmarks/fake_upstreams.py
+"""
+Local stand-ins for TMDB, Last.fm, Open Library and the Art Institute API.
+
+One aiohttp server answers all four with synthetic but realistically shaped
+JSON, after a configurable delay and with a configurable error rate:
+
+    python -m benchmarks.fake_upstreams --port 8930 --latency-ms 80 --error-rate 0.02
+
+Point the cogs at it with TMDB_API_BASE, LASTFM_API_URL, OPENLIBRARY_BASE and
+AIC_API_BASE (benchmarks.load_test does this for you).
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+GENRES = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 53, 10752, 37]
+SUBJECTS = ["fiction", "romance", "history", "science", "fantasy", "mystery", "poetry", "travel"]
+PAGES = 10
+
+
+class FakeUpstreams:
+    def __init__(self, latency_ms: float = 50.0, error_rate: float = 0.0, error_status: int = 503,
+                 seed: int = None):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def _delay(self):
+        # Uniform jitter around the configured mean
+        if self.latency:
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+
+    def _failed(self):
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=self.error_status, headers={"Retry-After": "0.1"})
+        return None
+
+    async def _serve(self, build):
+        self.requests += 1
+        await self._delay()
+        return self._failed() or web.json_response(build())
+
+    async def tmdb(self, request):
+        page = int(request.query.get("page", 1))
+        genre = request.query.get("with_genres", "")
+
+        def build():
+            if page > PAGES:
+                return {"page": page, "results": []}
+            return {"page": page, "total_pages": PAGES, "results": [{
+                "id": page * 1000 + i + hash(genre) % 997 * 100000,
+                "title": f"Movie {genre or 'popular'} {page}-{i}",
+                "overview": "A synthetic movie used for load testing. " * 4,
+                "poster_path": f"/poster{page}{i}.jpg",
+                "release_date": "2020-01-01",
+                "vote_average": round(self.rng.uniform(4, 9), 1),
+                "popularity": self.rng.uniform(10, 500),
+                "genre_ids": [int(genre.split(",")[0])] if genre else self.rng.sample(GENRES, 2),
+            } for i in range(20)]}
+        return await self._serve(build)
+
+    async def lastfm(self, request):
+        method = request.query.get("method")
+        if method == "track.getInfo":
+            def build():
+                return {"track": {"listeners": "12345", "playcount": "67890", "album": {
+                    "title": "Synthetic Album", "image": [{"#text": "https://example.com/album.png"}]}}}
+            return await self._serve(build)
+
+        tag = request.query.get("tag", "chill")
+        page = int(request.query.get("page", 1))
+        limit = int(request.query.get("limit", 50))
+
+        def build():
+            tracks = [] if page > PAGES else [{
+                "name": f"{tag} track {page}-{i}",
+                "url": f"https://www.last.fm/music/artist/_/{tag}-{page}-{i}",
+                "artist": {"name": f"Artist {i % 17}"},
+            } for i in range(limit)]
+            return {"tracks": {"track": tracks}}
+        return await self._serve(build)
+
+    async def openlibrary(self, request):
+        subject = request.match_info["subject"]
+        limit = int(request.query.get("limit", 50))
+        offset = int(request.query.get("offset", 0))
+
+        def build():
+            works = [] if offset >= PAGES * limit else [{
+                "key": f"/works/OL{subject}{offset + i}W",
+                "title": f"A {subject} book {offset + i}",
+                "authors": [{"name": f"Author {i % 23}"}],
+                "first_publish_year": 1900 + (offset + i) % 120,
+                "cover_id": 1000 + offset + i,
+                "subject": [subject, self.rng.choice(SUBJECTS), "Fiction"],
+            } for i in range(limit)]
+            return {"name": subject, "works": works}
+        return await self._serve(build)
+
+    async def aic(self, request):
+        page = int(request.query.get("page", 1))
+        limit = int(request.query.get("limit", 100))
+
+        def build():
+            data = [] if page > PAGES else [{
+                "id": page * 1000 + i,
+                "title": f"Artwork {page}-{i}",
+                "artist_title": f"Painter {i % 31}",
+                # Roughly one in five artworks has no image, like the real API
+                "image_id": None if i % 5 == 0 else f"img-{page}-{i}",
+                "date_display": "c. 1890",
+                "place_of_origin": self.rng.choice(["France", "Japan", "United States", "Italy"]),
+                "artwork_type_title": self.rng.choice(["Painting", "Print", "Photograph", "Sculpture"]),
+            } for i in range(limit)]
+            return {"data": data, "config": {"iiif_url": "https://www.artic.edu/iiif/2"}}
+        return await self._serve(build)
+
+    async def status(self, request):
+        return web.json_response({"requests": self.requests, "errors": self.errors})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/tmdb/discover/movie", self.tmdb)
+        app.router.add_get("/lastfm/2.0/", self.lastfm)
+        app.router.add_get("/openlibrary/subjects/{subject}.json", self.openlibrary)
+        app.router.add_get("/aic/artworks", self.aic)
+        app.router.add_get("/_status", self.status)
+        return app
+
+
+def upstream_env(base_url: str) -> dict:
+    """Environment that points every cog at a FakeUpstreams server at `base_url`."""
+    return {
+        "TMDB_API_BASE": f"{base_url}/tmdb",
+        "LASTFM_API_URL": f"{base_url}/lastfm/2.0/",
+        "OPENLIBRARY_BASE": f"{base_url}/openlibrary",
+        "AIC_API_BASE": f"{base_url}/aic",
+    }
+
+
+def run(host: str, port: int, latency_ms: float, error_rate: float, error_status: int, ready=None):
+    """Serve until killed; `ready` (a multiprocessing Event) is set once listening."""
+    async def serve():
+        runner = web.AppRunner(FakeUpstreams(latency_ms, error_rate, error_status).app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        if ready is not None:
+            ready.set()
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake TMDB/Last.fm/Open Library/AIC APIs locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8930)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    print(json.dumps(upstream_env(f"http://{args.host}:{args.port}"), indent=2))
+    run(args.host, args.port, args.latency_ms, args.error_rate, args.error_status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# benchmarks/load_test.py
+"""
+Offline load test: drive the real cog commands through fake contexts against
+local stand-in upstream APIs, at increasing concurrency.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1,16,64 --requests 400 \\
+        --latency-ms 120 --error-rate 0.05 --cold --json bench.json
+
+Reports p50/p99 command latency, commands per second, upstream requests and
+memory per concurrency level: current RSS and its change over the level, plus
+the level's peak Python heap with --tracemalloc. No Discord connection or API keys are
+needed; replies are captured by the fake context after a simulated Discord
+round trip.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import discord
+import numpy as np
+from discord.ext import commands
+
+from benchmarks.fake_upstreams import run as run_upstreams, upstream_env
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# command name -> (cog, attribute, kwargs)
+COMMANDS = {
+    "art": ("ArtCog", "random_art", {}),
+    "movie": ("MovieCog", "movie", {"genre": None}),
+    "book": ("BookCog", "suggest_book", {"topic": "fiction"}),
+    "song": ("SongCog", "suggest_song", {"tag": "chill"}),
+    "vibe": ("VibeCog", "vibe", {"mood": "chill"}),
+}
+EXTENSIONS = ["commands.art", "commands.movies", "commands.books", "commands.songs", "commands.vibe"]
+
+
+class FakeMessage:
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    async def edit(self, **kwargs):
+        await self.ctx.bench.discord_round_trip()
+        self.ctx.edits += 1
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the cogs' slash-command path."""
+
+    def __init__(self, ctx):
+        self._done = False
+        self.response = SimpleNamespace(is_done=lambda: self._done)
+        self.followup = SimpleNamespace(send=ctx.send)
+
+
+class FakeContext:
+    """Stands in for commands.Context; replies are recorded instead of sent."""
+
+    def __init__(self, bench, command: str, channel_id: int, guild_id: int, interaction: bool):
+        self.bench = bench
+        self.command = SimpleNamespace(qualified_name=command)
+        self.channel = SimpleNamespace(id=channel_id)
+        self.guild = SimpleNamespace(id=guild_id)
+        self.interaction = FakeInteraction(self) if interaction else None
+        self.command_failed = False
+        self.replies = []
+        self.edits = 0
+
+    async def defer(self):
+        await self.bench.discord_round_trip()
+        self.interaction._done = True
+
+    async def send(self, content=None, *, embed=None, embeds=None, **kwargs):
+        await self.bench.discord_round_trip()
+        self.replies.append(content if content is not None else (embed or embeds))
+        return FakeMessage(self)
+
+    @property
+    def failed(self) -> bool:
+        # Cogs answer failures with a plain-text message instead of an embed
+        return not self.replies or isinstance(self.replies[0], str)
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.discord_latency = args.discord_latency_ms / 1000
+        self.bot = None
+
+    async def discord_round_trip(self):
+        if self.discord_latency:
+            await asyncio.sleep(self.discord_latency)
+
+    async def setup(self):
+        # Imported here so the upstream env overrides are in place before the cogs read them
+        from http_client import HttpClient
+        from rate_limit import RateLimiter
+        from response_cache import ResponseCache
+
+        self.bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+        self.bot.response_cache = ResponseCache(max_entries=512)
+        limiter = RateLimiter({"127.0.0.1": (self.args.upstream_rps, int(self.args.upstream_rps))})
+        self.bot.http_client = HttpClient(cache=self.bot.response_cache, limiter=limiter)
+        await self.bot.http_client.start()
+        for extension in EXTENSIONS:
+            await self.bot.load_extension(extension)
+
+    async def teardown(self):
+        for extension in list(self.bot.extensions):
+            await self.bot.unload_extension(extension)
+        await self.bot.http_client.close()
+
+    def make_cold(self):
+        for pool in getattr(self.bot, "candidate_pools", {}).values():
+            pool.clear()
+        self.bot.response_cache.clear()
+
+    async def invoke(self, command: str, i: int) -> tuple:
+        cog_name, attribute, kwargs = COMMANDS[command]
+        cog = self.bot.get_cog(cog_name)
+        # Spread invocations over a handful of guilds/channels like real traffic
+        ctx = FakeContext(self, command, channel_id=1000 + i % 50, guild_id=i % 10,
+                          interaction=self.args.interaction)
+        if self.args.cold:
+            self.make_cold()
+        started = time.perf_counter()
+        try:
+            await getattr(cog, attribute).callback(cog, ctx, **kwargs)
+            failed = ctx.failed
+        except Exception:
+            failed = True
+        return command, time.perf_counter() - started, failed
+
+    async def run_level(self, concurrency: int, total: int) -> dict:
+        names = self.args.commands
+        jobs = iter(range(total))
+        samples = {name: [] for name in names}
+        failures = 0
+
+        async def worker():
+            nonlocal failures
+            for i in jobs:
+                command, seconds, failed = await self.invoke(names[i % len(names)], i)
+                samples[command].append(seconds)
+                failures += failed
+
+        requests_before = self.bot.http_client.requests
+        coalesced_before = self.bot.http_client.coalesced
+        rss_before = current_rss_mb()
+        if tracemalloc.is_tracing():
+            # Peak heap is measured per level, not since process start
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        every = [s for per_command in samples.values() for s in per_command]
+        return {
+            "concurrency": concurrency,
+            "commands": total,
+            "seconds": round(elapsed, 3),
+            "commands_per_second": round(total / elapsed, 1),
+            "p50_ms": round(float(np.percentile(every, 50)) * 1000, 2),
+            "p99_ms": round(float(np.percentile(every, 99)) * 1000, 2),
+            "failures": failures,
+            "upstream_requests": self.bot.http_client.requests - requests_before,
+            "coalesced": self.bot.http_client.coalesced - coalesced_before,
+            "rss_mb": round(current_rss_mb(), 1),
+            "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+            "traced_mb": round(tracemalloc.get_traced_memory()[0] / 1e6, 1) if tracemalloc.is_tracing() else None,
+            "traced_peak_mb": round(tracemalloc.get_traced_memory()[1] / 1e6, 1) if tracemalloc.is_tracing() else None,
+            "per_command": {
+                name: {"p50_ms": round(float(np.percentile(s, 50)) * 1000, 2),
+                       "p99_ms": round(float(np.percentile(s, 99)) * 1000, 2)}
+                for name, s in samples.items() if s
+            },
+        }
+
+
+def current_rss_mb() -> float:
+    """Resident memory right now; ru_maxrss would only ever show the process-wide peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0.0
+    # No /proc (macOS): fall back to the peak (bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e6
+
+
+async def run(args) -> list:
+    bench = Bench(args)
+    await bench.setup()
+    try:
+        if not args.cold:
+            # Warm-up: one of each command so the timed runs measure the steady state
+            for i, name in enumerate(args.commands):
+                await bench.invoke(name, i)
+        results = []
+        print(f"{'conc':>5} {'cmds/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'fail':>5} {'upstream':>9} "
+              f"{'coalesced':>9} {'rss MB':>7} {'Δrss MB':>8} {'heap pk':>8}")
+        for concurrency in args.concurrency:
+            result = await bench.run_level(concurrency, args.requests)
+            results.append(result)
+            print(f"{concurrency:>5} {result['commands_per_second']:>8} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+                  f"{result['failures']:>5} {result['upstream_requests']:>9} {result['coalesced']:>9} "
+                  f"{result['rss_mb']:>7} {result['rss_delta_mb']:>8} {str(result['traced_peak_mb'] or '-'):>8}")
+            if args.per_command:
+                for name, stats in result["per_command"].items():
+                    print(f"{'':>5}   {name:<6} p50 {stats['p50_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms")
+        return results
+    finally:
+        await bench.teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the cog commands against local fake upstreams.")
+    parser.add_argument("--concurrency", default="1,8,32,128",
+                        type=lambda s: [int(c) for c in s.split(",")])
+    parser.add_argument("--requests", type=int, default=500, help="commands per concurrency level")
+    parser.add_argument("--commands", default=",".join(COMMANDS),
+                        type=lambda s: [c.strip() for c in s.split(",") if c.strip()])
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="mean upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--discord-latency-ms", type=float, default=40.0, help="simulated Discord round trip")
+    parser.add_argument("--upstream-rps", type=float, default=1000.0, help="rate limit towards the fake upstreams")
+    parser.add_argument("--cold", action="store_true", help="clear pools and caches before every command")
+    parser.add_argument("--interaction", action="store_true", help="use the slash-command (defer/followup) path")
+    parser.add_argument("--per-command", action="store_true", help="also print p50/p99 per command")
+    parser.add_argument("--tracemalloc", action="store_true", help="report Python heap usage (slower)")
+    parser.add_argument("--port", type=int, default=8931)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    os.environ.update(upstream_env(f"http://127.0.0.1:{args.port}"))
+    os.environ.setdefault("TMDB_API_KEY", "bench")
+    os.environ.setdefault("LASTFM_API_KEY", "bench")
+
+    # Upstreams run in their own process so they don't compete with the bot's event loop
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    upstreams = ctx.Process(target=run_upstreams, daemon=True, args=(
+        "127.0.0.1", args.port, args.latency_ms, args.error_rate, args.error_status, ready))
+    upstreams.start()
+    try:
+        if not ready.wait(timeout=15):
+            raise SystemExit("fake upstreams did not start")
+        if args.tracemalloc:
+            tracemalloc.start()
+        results = asyncio.run(run(args))
+    finally:
+        upstreams.terminate()
+        upstreams.join()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "json"}, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/vibe_index.py
+"""
+Query latency of the /vibe index against index size.
+
+    python -m benchmarks.vibe_index --sizes 1000,5000,20000 --queries 500
+
+Items are synthetic but shaped like the real ones: a few genre/tag/subject
+terms plus title words, spread over the same kinds the cogs index.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from vibe_index import VibeIndex, MOOD_TERMS
+
+TAGS = sorted({t for terms in MOOD_TERMS.values() for t in terms} | set(MOOD_TERMS)) + [
+    "drama", "comedy", "documentary", "western", "poetry", "biography", "sculpture", "painting",
+    "photography", "indie", "jazz", "rock", "pop", "synth", "folk", "children", "travel", "cooking",
+]
+WORDS = ["night", "city", "river", "summer", "letters", "house", "garden", "light", "ocean", "winter",
+         "song", "road", "stars", "portrait", "dream", "shadow", "heart", "glass", "storm", "machine"]
+KINDS = ["movie", "song", "book", "art"]
+MOODS = ["chill", "rainy sunday", "dark", "nostalgic summer", "creative focus", "romantic jazz night",
+         "something epic", "sad poetry", "happy", "spooky halloween"]
+
+
+def build(size: int, dim: int, rng: random.Random) -> tuple:
+    index = VibeIndex(dim=dim, max_items=size)
+    started = time.perf_counter()
+    for i in range(size):
+        terms = [(rng.choice(TAGS), 2.0) for _ in range(rng.randint(1, 4))]
+        terms.append((" ".join(rng.sample(WORDS, 3)), 0.5))
+        index.add(rng.choice(KINDS), i, f"item {i}", terms)
+    return index, time.perf_counter() - started
+
+
+def percentile(samples: list, q: float) -> float:
+    return float(np.percentile(samples, q)) if samples else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VibeIndex query latency vs index size.")
+    parser.add_argument("--sizes", default="1000,5000,20000,50000")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'items':>8} {'dim':>5} {'MB':>7} {'add/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        index, build_seconds = build(size, args.dim, rng)
+        np_rng = np.random.default_rng(args.seed)
+        index.query("warm up", rng=np_rng)
+        samples = []
+        for i in range(args.queries):
+            started = time.perf_counter()
+            index.query(MOODS[i % len(MOODS)], rng=np_rng)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"{size:>8} {args.dim:>5} {index.stats()['bytes'] / 1e6:>7.1f} {size / build_seconds:>10.0f} "
+              f"{percentile(samples, 50):>8.3f} {percentile(samples, 99):>8.3f} {max(samples):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
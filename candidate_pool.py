@@ -0,0 +1,303 @@
+# candidate_pool.py
+import random
+import time
+from collections import OrderedDict
+
+from discord.ext import tasks
+
+
+class CandidateIndex:
+    """
+    De-duplicated list of candidates for one pool key, grown page by page.
+
+    `next_page` is the cursor of the next upstream page to walk; once the
+    upstream runs dry or `max_pages` is reached the index is complete until
+    it is due for a refresh.
+    """
+
+    __slots__ = ("items", "ids", "next_page", "complete", "completed_at")
+
+    def __init__(self):
+        self.items = []
+        self.ids = {}
+        self.next_page = 1
+        self.complete = False
+        self.completed_at = 0.0
+
+
+class CandidatePool:
+    """
+    Per-key candidate indexes (movies, tracks, books, ...) sampled in O(1).
+
+    A background PoolWarmer walks further upstream pages for each key and
+    merges them in, so commands draw uniformly from thousands of items
+    without ever requesting more than one page inline.
+    """
+
+    def __init__(self, name: str, id_of=None, max_items: int = 2000, max_pages: int = 10,
+                 refresh_after: float = 6 * 3600, max_keys: int = 64):
+        self.name = name
+        self.id_of = id_of or (lambda item: item.get("id"))
+        self.max_items = max_items
+        self.max_pages = max_pages
+        self.refresh_after = refresh_after
+        self.max_keys = max_keys
+        self._indexes = OrderedDict()
+        # Configured warm keys; never evicted to make room for keys users typed
+        self.pinned = set()
+        self.served = 0
+        self.empty = 0
+        # Keys changed since the last take_dirty(), for incremental snapshots
+        self._dirty = set()
+        # Called as listener(pool, key, new_items) whenever new candidates are indexed
+        self.listeners = []
+
+    def _index(self, key: str) -> CandidateIndex:
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = CandidateIndex()
+            while len(self._indexes) > self.max_keys:
+                victim = next((k for k in self._indexes if k not in self.pinned and k != key), None)
+                if victim is None:
+                    break
+                del self._indexes[victim]
+        self._indexes.move_to_end(key)
+        return index
+
+    def add(self, key: str, items: list, page: int = None, exhausted: bool = None) -> int:
+        """
+        Merge `items` into the index for `key`, skipping duplicates.
+        When `page` is given the walk cursor advances past it. Returns the number added.
+        `exhausted` says whether the upstream ran out of pages; by default an
+        empty page means it did, which is wrong when the fetch filtered items out.
+        Nothing is indexed for a new, unpinned key until a page has results, so
+        typos and junk keys never become keys the warmer walks.
+        """
+        if not items and key not in self._indexes and key not in self.pinned:
+            return 0
+        index = self._index(key)
+        added = 0
+        new_items = []
+        for item in items:
+            item_id = self.id_of(item)
+            if item_id is None:
+                continue
+            slot = index.ids.get(item_id)
+            if slot is not None:
+                # Same item seen again: keep the freshest copy
+                index.items[slot] = item
+                continue
+            if len(index.items) < self.max_items:
+                index.ids[item_id] = len(index.items)
+                index.items.append(item)
+            else:
+                # Full: overwrite a random slot so refreshed pages still rotate in
+                slot = random.randrange(len(index.items))
+                index.ids.pop(self.id_of(index.items[slot]), None)
+                index.ids[item_id] = slot
+                index.items[slot] = item
+            added += 1
+            new_items.append(item)
+
+        if page is not None and page >= index.next_page:
+            index.next_page = page + 1
+            if exhausted is None:
+                exhausted = not items
+            if exhausted or index.next_page > self.max_pages:
+                index.complete = True
+                index.completed_at = time.monotonic()
+        if added or page is not None:
+            self._dirty.add(key)
+        if new_items:
+            for listener in self.listeners:
+                listener(self, key, new_items)
+        return added
+
+    def take_dirty(self) -> list:
+        """Pop the keys whose index changed since the last call."""
+        dirty, self._dirty = self._dirty, set()
+        return [key for key in dirty if key in self._indexes]
+
+    def snapshot(self, key: str) -> dict:
+        """Copy of the index for `key` that is safe to serialize off the event loop."""
+        index = self._indexes[key]
+        return {
+            "items": list(index.items),
+            "next_page": index.next_page,
+            "complete": index.complete,
+            # Wall-clock, so the refresh schedule survives a restart
+            "completed_at": time.time() - (time.monotonic() - index.completed_at) if index.complete else None,
+        }
+
+    def restore(self, key: str, state: dict):
+        """
+        Merge a snapshot() taken by an earlier process into the index for `key`.
+        Anything fetched since startup is kept; the walk cursor never moves back.
+        """
+        had_items = self.size(key) > 0
+        self.add(key, state["items"])
+        index = self._index(key)
+        index.next_page = max(index.next_page, state["next_page"])
+        if state["complete"] and not index.complete:
+            index.complete = True
+            age = max(0.0, time.time() - (state.get("completed_at") or time.time()))
+            index.completed_at = time.monotonic() - age
+        if not had_items:
+            # Nothing new to write back
+            self._dirty.discard(key)
+
+    def sample(self, key: str, exclude=None, attempts: int = 8, prefer=None):
+        """
+        Uniformly pick one candidate for `key`, or None if nothing is indexed yet.
+        `exclude(item)` rejects candidates (e.g. recently shown ones) and
+        `prefer(item)` favours some of the rest (e.g. verified artwork). After
+        `attempts` draws the first non-excluded one is returned, a small index is
+        scanned instead, and if every item is excluded the last draw is returned anyway.
+        """
+        index = self._indexes.get(key)
+        if index is None or not index.items:
+            # The key is only remembered (and warmed) once an inline fetch finds results
+            self.empty += 1
+            return None
+        self.served += 1
+        fallback = None
+        for _ in range(attempts):
+            item = random.choice(index.items)
+            if exclude is not None and exclude(item):
+                continue
+            if prefer is None or prefer(item):
+                return item
+            if fallback is None:
+                fallback = item
+        if len(index.items) <= 256:
+            remaining = [candidate for candidate in index.items if exclude is None or not exclude(candidate)]
+            preferred = [candidate for candidate in remaining if prefer(candidate)] if prefer else []
+            if preferred or remaining:
+                return random.choice(preferred or remaining)
+        return fallback if fallback is not None else item
+
+    def pin(self, keys):
+        """Exempt `keys` (the configured warm keys) from LRU eviction; replaces the previous set."""
+        self.pinned = set(keys)
+
+    def clear(self):
+        """Forget every index (keys included), e.g. to benchmark cold commands."""
+        self._indexes.clear()
+        self._dirty.clear()
+
+    def size(self, key: str) -> int:
+        index = self._indexes.get(key)
+        return len(index.items) if index else 0
+
+    def items(self, key: str) -> list:
+        """Indexed candidates for `key` (read-only view for background jobs)."""
+        index = self._indexes.get(key)
+        return index.items if index else []
+
+    def keys(self) -> list:
+        return list(self._indexes.keys())
+
+    def next_page(self, key: str):
+        """Page the warmer should fetch next for `key`, or None if the index is complete."""
+        index = self._indexes.get(key)
+        if index is None:
+            return 1
+        if index.complete:
+            if time.monotonic() - index.completed_at < self.refresh_after:
+                return None
+            # Walk again from the start; merged pages refresh existing entries
+            index.complete = False
+            index.next_page = 1
+        return index.next_page
+
+    def keys_needing_pages(self, keys) -> list:
+        """Keys whose index is still growing, smallest first."""
+        pending = [k for k in dict.fromkeys(keys) if self.next_page(k) is not None]
+        return sorted(pending, key=self.size)
+
+    def stats(self) -> dict:
+        return {
+            "served": self.served,
+            "empty": self.empty,
+            "keys": {k: {"items": len(i.items), "next_page": i.next_page, "complete": i.complete}
+                     for k, i in self._indexes.items()},
+        }
+
+
+class PoolWarmer:
+    """
+    Background task that grows a CandidatePool page by page.
+
+    `fetch(key, page)` returns (status, items) like HttpClient.get_json, or
+    (status, items, exhausted) when it filters the page (see CandidatePool.add). Each
+    tick fetches at most `budget` pages, so the warmer never spends more than
+    `budget` upstream requests per `interval` seconds.
+    """
+
+    def __init__(self, pool: CandidatePool, keys, fetch, interval: float = 15.0, budget: int = 3):
+        self.pool = pool
+        self._keys = keys
+        self.fetch = fetch
+        self.budget = budget
+        self.failures = 0
+        self._loop = tasks.loop(seconds=interval)(self._tick)
+
+    def start(self):
+        if not self._loop.is_running():
+            self._loop.start()
+
+    def stop(self):
+        self._loop.cancel()
+
+    def configured_keys(self) -> list:
+        return self._keys() if callable(self._keys) else list(self._keys)
+
+    def keys(self) -> list:
+        # Keys users asked for (and that the pool now remembers) are kept warm too
+        return self.configured_keys() + self.pool.keys()
+
+    async def _tick(self):
+        self.pool.pin(self.configured_keys())
+        for key in self.pool.keys_needing_pages(self.keys())[:self.budget]:
+            page = self.pool.next_page(key)
+            try:
+                result = await self.fetch(key, page)
+            except Exception:
+                self.failures += 1
+                continue
+            status, items = result[:2]
+            if status != 200:
+                self.failures += 1
+                continue
+            self.pool.add(key, items, page=page, exhausted=result[2] if len(result) > 2 else None)
+
+
+def get_pool(bot, name: str, **kwargs) -> CandidatePool:
+    """Return the bot-wide pool called `name`, creating it on first use."""
+    pools = getattr(bot, "candidate_pools", None)
+    if pools is None:
+        pools = bot.candidate_pools = {}
+    if name not in pools:
+        pool = pools[name] = CandidatePool(name, **kwargs)
+        pool.listeners.extend(getattr(bot, "pool_listeners", ()))
+    return pools[name]
+
+
+def add_pool_listener(bot, listener):
+    """
+    Call `listener(pool, key, new_items)` for candidates indexed by any pool,
+    including pools created later. Existing candidates are not replayed.
+    """
+    listeners = getattr(bot, "pool_listeners", None)
+    if listeners is None:
+        listeners = bot.pool_listeners = []
+    listeners.append(listener)
+    for pool in getattr(bot, "candidate_pools", {}).values():
+        pool.listeners.append(listener)
+
+
+def remove_pool_listener(bot, listener):
+    for listeners in [getattr(bot, "pool_listeners", [])] + [
+            pool.listeners for pool in getattr(bot, "candidate_pools", {}).values()]:
+        if listener in listeners:
+            listeners.remove(listener)
@@ -0,0 +1,72 @@
+# command_sync.py
+import asyncio
+import hashlib
+import json
+
+
+def command_payloads(tree, guild=None) -> dict:
+    """(type, name) -> payload for every app command tree.sync() would upload for `guild`."""
+    payloads = (command.to_dict(tree) for command in tree.get_commands(guild=guild))
+    return {(payload.get("type", 1), payload["name"]): payload for payload in payloads}
+
+
+def tree_hash(tree, guild=None) -> str:
+    """Stable hash of the application-command payload tree.sync() would upload for `guild`."""
+    payloads = command_payloads(tree, guild)
+    payload = [payloads[key] for key in sorted(payloads)]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _state_name(bot, guild) -> str:
+    return f"command_tree:{bot.application_id}:{guild.id if guild else 'global'}"
+
+
+async def _remember(bot, guild, store):
+    if store is not None:
+        await asyncio.to_thread(store.set_meta, _state_name(bot, guild), tree_hash(bot.tree, guild))
+
+
+async def sync_if_changed(bot, guild=None, store=None, force: bool = False):
+    """
+    tree.sync() for `guild` (None = global) only when the command payload differs
+    from the last one synced, as recorded in `store` (a SnapshotStore).
+    Returns the synced commands, or None when the sync was skipped.
+    """
+    if store is not None and not force:
+        if await asyncio.to_thread(store.get_meta, _state_name(bot, guild)) == tree_hash(bot.tree, guild):
+            return None
+    synced = await bot.tree.sync(guild=guild)
+    await _remember(bot, guild, store)
+    return synced
+
+
+async def sync_changed_commands(bot, before: dict, guild=None, store=None):
+    """
+    Push only the app commands that differ from `before` (a command_payloads()
+    snapshot): changed or new commands are upserted one by one and removed ones
+    deleted, instead of re-uploading the whole tree. Returns (upserted, deleted).
+    """
+    after = command_payloads(bot.tree, guild)
+    changed = [payload for key, payload in after.items() if before.get(key) != payload]
+    removed = [key for key in before if key not in after]
+    if not changed and not removed:
+        return 0, 0
+
+    app_id = bot.application_id
+    for payload in changed:
+        if guild is None:
+            await bot.http.upsert_global_command(app_id, payload)
+        else:
+            await bot.http.upsert_guild_command(app_id, guild.id, payload)
+    if removed:
+        ids = {(command.type.value, command.name): command.id
+               for command in await bot.tree.fetch_commands(guild=guild)}
+        for key in removed:
+            if key not in ids:
+                continue
+            if guild is None:
+                await bot.http.delete_global_command(app_id, ids[key])
+            else:
+                await bot.http.delete_guild_command(app_id, guild.id, ids[key])
+    await _remember(bot, guild, store)
+    return len(changed), len(removed)
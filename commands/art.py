@@ -1,50 +1,95 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiohttp
-import random
+import os
+from candidate_pool import PoolWarmer, get_pool
+from admission import BUSY_MESSAGE, cache_only
+from media_resolver import get_media_resolver
+from recent_history import get_history, history_scopes
+from metrics import command_timer
+
+# Overridable so benchmarks can point the cog at a local stand-in
+AIC_API_BASE = os.getenv("AIC_API_BASE", "https://api.artic.edu/api/v1")
 
 class ArtCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    @commands.hybrid_command(name="art", description="Show a random artwork")
-    async def random_art(self, ctx):
-        """Show a random artwork"""
-        is_interaction = getattr(ctx, "interaction", None) is not None
-        if is_interaction and not ctx.interaction.response.is_done():
-            await ctx.defer()
-        
-        async with aiohttp.ClientSession() as session:
-            # Get artworks from the API with image info included
-            url = "https://api.artic.edu/api/v1/artworks?page=1&limit=100&fields=id,title,artist_title,image_id,date_display,place_of_origin,artwork_type_title"
-            async with session.get(url) as response:
-                data = await response.json()
-            
-            # Get the IIIF base URL from config
-            config = data.get("config", {})
-            iiif_url = config.get("iiif_url", "https://www.artic.edu/iiif/2")
-            
-            # Filter artworks that have valid image_id
-            artworks = data.get("data", [])
-            artworks_with_images = [art for art in artworks if art.get("image_id")]
-            
+        # Artworks with images are indexed across many AIC pages in the background
+        self.pool = get_pool(bot, "aic", max_items=5000,
+                             max_pages=int(os.getenv("AIC_MAX_PAGES", "50")))
+        self.warmer = PoolWarmer(self.pool, [""], self.fetch_artworks,
+                                 interval=float(os.getenv("WARMER_INTERVAL", "15")))
+        # Recently shown artworks per channel/guild are skipped
+        self.history = get_history(bot)
+        # Image sizes are checked in the background; picks favour artworks whose image loads
+        self.media = get_media_resolver(bot)
+        self.media.register(self.pool.name, self.image_variants)
+
+    async def cog_load(self):
+        self.warmer.start()
+
+    async def cog_unload(self):
+        self.warmer.stop()
+
+    async def fetch_artworks(self, key: str = "", page: int = 1):
+        """
+        Fetch one page of artworks that have an image. Returns (status, artworks, exhausted)
+        with iiif_url attached; exhausted is True only when the raw page was empty.
+        """
+        # Get artworks from the API with image info included
+        url = f"{AIC_API_BASE}/artworks"
+        params = {
+            "page": page,
+            "limit": 100,
+            "fields": "id,title,artist_title,image_id,date_display,place_of_origin,artwork_type_title",
+        }
+        status, data = await self.bot.http_client.get_json(
+            url, params=params, cache="aic" if page == 1 else None)
+        if status != 200:
+            return status, [], False
+
+        # Get the IIIF base URL from config
+        config = data.get("config", {})
+        iiif_url = config.get("iiif_url", "https://www.artic.edu/iiif/2")
+
+        # Filter artworks that have valid image_id once here, so commands never see image-less entries
+        # A page where nothing has an image is not the end of the collection
+        artworks = data.get("data", [])
+        return status, [dict(art, iiif_url=iiif_url) for art in artworks if art.get("image_id")], not artworks
+
+    async def pick_artwork(self, scopes=(), fetch: bool = True):
+        """
+        Draw a random artwork not recently shown in `scopes` from the index;
+        fetch inline only when the pool is cold (and `fetch` allows it).
+        """
+        art = self.history.pick(self.pool, "", scopes, prefer=self.media.prefer(self.pool))
+        if art is None and fetch:
+            _, artworks_with_images, exhausted = await self.fetch_artworks()
             if not artworks_with_images:
-                if is_interaction:
-                    await ctx.interaction.followup.send("❌ No artworks with images found.")
-                else:
-                    await ctx.send("❌ No artworks with images found.")
-                return
-            
+                return None
+
             # Select a random artwork
-            art = random.choice(artworks_with_images)
+            self.pool.add("", artworks_with_images, page=1, exhausted=exhausted)
+            art = self.history.pick(self.pool, "", scopes)
+        return art
+
+    def image_variants(self, art):
+        # IIIF renditions, largest first; AIC recommends 843px but some images are smaller
+        iiif_url = art.get("iiif_url", "https://www.artic.edu/iiif/2")
+        image_id = art.get("image_id")
+        if not image_id:
+            return []
+        return [f"{iiif_url}/{image_id}/full/{width},/0/default.jpg" for width in (843, 600, 400)]
 
+    def build_embed(self, art):
         title = art.get("title", "Unknown")
         artist = art.get("artist_title", "Unknown Artist")
         image_id = art.get("image_id")
         date = art.get("date_display", "Unknown date")
         place = art.get("place_of_origin", "Unknown origin")
         art_type = art.get("artwork_type_title", "Artwork")
+        iiif_url = art.get("iiif_url", "https://www.artic.edu/iiif/2")
 
         # Create aesthetic embed with Chiya-Pop colors
         embed = discord.Embed(
@@ -56,15 +101,42 @@ class ArtCog(commands.Cog):
         # Set the artwork image using the correct IIIF URL format
         if image_id:
             # Use the full URL format: {iiif_url}/{image_id}/full/843,/0/default.jpg
-            image_url = f"{iiif_url}/{image_id}/full/843,/0/default.jpg"
-            embed.set_image(url=image_url)
+            # (or the checked size that actually loads; None when no size does)
+            image_url = self.media.image_url(self.pool, art, f"{iiif_url}/{image_id}/full/843,/0/default.jpg")
+            if image_url:
+                embed.set_image(url=image_url)
         
         embed.set_footer(text="🖼️ Art Institute of Chicago")
+        return embed
+
+    @commands.hybrid_command(name="art", description="Show a random artwork")
+    async def random_art(self, ctx):
+        """Show a random artwork"""
+        timer = command_timer(ctx)
+        is_interaction = getattr(ctx, "interaction", None) is not None
+        if is_interaction and not ctx.interaction.response.is_done():
+            await ctx.defer()
+        timer.mark("defer")
+        
+        art = await self.pick_artwork(history_scopes(ctx), fetch=not cache_only(ctx))
+        if art is None:
+            # Under overload a cold pool is answered with "busy" instead of an upstream call
+            message = BUSY_MESSAGE if cache_only(ctx) else "❌ No artworks with images found."
+            if is_interaction:
+                await ctx.interaction.followup.send(message)
+            else:
+                await ctx.send(message)
+            return
+        timer.mark("fetch")
+
+        embed = self.build_embed(art)
+        timer.mark("parse")
 
         if is_interaction:
             await ctx.interaction.followup.send(embed=embed)
         else:
             await ctx.send(embed=embed)
+        timer.mark("send")
 
 async def setup(bot):
     await bot.add_cog(ArtCog(bot))
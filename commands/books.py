@@ -1,31 +1,114 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
-import aiohttp
-import random
+import os
+import asyncio
+import heapq
+from candidate_pool import PoolWarmer, get_pool
+from admission import BUSY_MESSAGE, cache_only
+from media_resolver import get_media_resolver
+from recent_history import get_history, history_scopes
+from metrics import command_timer
+from prefix_index import PrefixIndex, get_prefix_index
+
+# Overridable so benchmarks can point the cog at a local stand-in
+OPENLIBRARY_BASE = os.getenv("OPENLIBRARY_BASE", "https://openlibrary.org")
+
+def subject_key(topic: str) -> str:
+    # Open Library subject slugs use underscores ("science fiction" -> science_fiction)
+    return topic.strip().lower().replace(" ", "_")
 
 class BookCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    @app_commands.describe(topic="Subject to explore, e.g., fiction, romance, history")
-    @commands.hybrid_command(name="book", description="Suggest a random book from OpenLibrary")
-    async def suggest_book(self, ctx, topic: str = "fiction"):
-        """Suggests a random book from OpenLibrary"""
-        is_interaction = getattr(ctx, "interaction", None) is not None
-        if is_interaction and not ctx.interaction.response.is_done():
-            await ctx.defer()
-        url = f"https://openlibrary.org/subjects/{topic}.json?limit=5"
+        # Subjects kept warm in the background (comma-separated, configurable via .env),
+        # keyed the way pick_book looks them up
+        self.warm_subjects = [subject_key(s) for s in os.getenv(
+            "OPENLIBRARY_WARM_SUBJECTS", "fiction,romance,history,science,fantasy,mystery,poetry").split(",") if s.strip()]
+        self.pool = get_pool(bot, "openlibrary", id_of=lambda work: work.get("key"), max_items=400,
+                             max_pages=int(os.getenv("OPENLIBRARY_MAX_PAGES", "8")))
+        self.warmer = PoolWarmer(self.pool, self.warm_subjects, self.fetch_books,
+                                 interval=float(os.getenv("WARMER_INTERVAL", "15")))
+        # Recently shown books per channel/guild are skipped
+        self.history = get_history(bot)
+        # Covers are checked in the background; picks favour works whose cover loads
+        self.media = get_media_resolver(bot)
+        self.media.register(self.pool.name, self.cover_variants)
+        # Topic autocomplete; subjects of indexed works are merged in by refresh_subjects
+        self.subject_index = get_prefix_index(bot, "openlibrary_subjects")
+        self.subject_index.update({subject: 1.0 for subject in self.warm_subjects})
+        self.max_subjects = int(os.getenv("OPENLIBRARY_MAX_SUBJECTS", "2000"))
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                data = await response.json()
+    async def cog_load(self):
+        self.warmer.start()
+        self.refresh_subjects.start()
 
-        if "works" not in data or not data["works"]:
-            await ctx.send(f"❌ No books found for '{topic}'.")
-            return
+    async def cog_unload(self):
+        self.warmer.stop()
+        self.refresh_subjects.cancel()
+
+    @tasks.loop(minutes=10)
+    async def refresh_subjects(self):
+        """Rank subjects by how often they appear on indexed works; no extra upstream calls."""
+        # Copy the item lists on the loop; counting and sorting run in a worker thread
+        works = [(key, list(self.pool.items(key))) for key in self.pool.keys()]
+        index = await asyncio.to_thread(self._build_subject_index, works)
+        # Swap the whole index in, so subjects of works that rotated out are dropped too
+        self.bot.prefix_indexes[index.name] = self.subject_index = index
+
+    def _build_subject_index(self, works: list) -> PrefixIndex:
+        counts = {}
+        for key, items in works:
+            counts[key] = counts.get(key, 0.0) + 1.0
+            for work in items:
+                for subject in work.get("subject") or []:
+                    subject = subject.lower()
+                    # Skip catalogue codes like "nyt:hardcover-fiction=2008-01-01"
+                    if len(subject) > 40 or ":" in subject:
+                        continue
+                    counts[subject] = counts.get(subject, 0.0) + 1.0
+        top = heapq.nlargest(self.max_subjects, counts.items(), key=lambda kv: kv[1])
+        terms = dict(top)
+        for subject in self.warm_subjects:
+            terms[subject] = max(terms.get(subject, 0.0), 1.0)
+        index = PrefixIndex(self.subject_index.name)
+        index.update(terms, replace=True)
+        return index
+
+    async def fetch_books(self, topic: str, page: int = 1):
+        """Fetch one page of works for an Open Library subject. Returns (status, works)."""
+        url = f"{OPENLIBRARY_BASE}/subjects/{topic}.json"
+        params = {"limit": 50, "offset": (page - 1) * 50}
+        status, data = await self.bot.http_client.get_json(
+            url, params=params, cache="openlibrary" if page == 1 else None)
+        if status != 200:
+            return status, []
+        return status, data.get("works") or []
+
+    async def pick_book(self, topic: str, scopes=(), fetch: bool = True):
+        """
+        Draw a random work for a subject, not recently shown in `scopes`, from the
+        index; fetch inline only when the pool is cold (and `fetch` allows it).
+        """
+        key = subject_key(topic)
+        book = self.history.pick(self.pool, key, scopes, prefer=self.media.prefer(self.pool))
+        if book is None and fetch:
+            _, works = await self.fetch_books(key)
+            if not works:
+                return None
+            self.pool.add(key, works, page=1)
+            book = self.history.pick(self.pool, key, scopes)
+        return book
 
-        book = random.choice(data["works"])
+    def cover_variants(self, book):
+        # default=false makes a missing cover a 404 instead of a blank placeholder image
+        cover_id = book.get("cover_id")
+        if not cover_id:
+            return []
+        return [f"https://covers.openlibrary.org/b/id/{cover_id}-{size}.jpg?default=false" for size in ("L", "M")]
+
+    def build_embed(self, book):
         title = book.get("title", "Unknown")
         author = book["authors"][0]["name"] if book.get("authors") else "Unknown"
         link = f"https://openlibrary.org{book.get('key', '')}"
@@ -42,8 +125,9 @@ class BookCog(commands.Cog):
         
         # Add book cover if available
         if cover_id:
-            cover_url = f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg"
-            embed.set_image(url=cover_url)
+            cover_url = self.media.image_url(self.pool, book, f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg")
+            if cover_url:
+                embed.set_image(url=cover_url)
         
         # Add subject tags if available
         if book.get("subject"):
@@ -51,11 +135,38 @@ class BookCog(commands.Cog):
             embed.add_field(name="📖 Topics", value=subjects, inline=False)
         
         embed.set_footer(text="📚 Open Library", icon_url="https://openlibrary.org/static/images/openlibrary-logo-tighter.svg")
+        return embed
+
+    @app_commands.describe(topic="Subject to explore, e.g., fiction, romance, history")
+    @commands.hybrid_command(name="book", description="Suggest a random book from OpenLibrary")
+    async def suggest_book(self, ctx, topic: str = "fiction"):
+        """Suggests a random book from OpenLibrary"""
+        timer = command_timer(ctx)
+        is_interaction = getattr(ctx, "interaction", None) is not None
+        if is_interaction and not ctx.interaction.response.is_done():
+            await ctx.defer()
+        timer.mark("defer")
+
+        # Sample from the indexed works for this subject; fetch inline only when the pool is cold
+        book = await self.pick_book(topic, history_scopes(ctx), fetch=not cache_only(ctx))
+        if book is None:
+            await ctx.send(BUSY_MESSAGE if cache_only(ctx) else f"❌ No books found for '{topic}'.")
+            return
+        timer.mark("fetch")
+
+        embed = self.build_embed(book)
+        timer.mark("parse")
         
         if is_interaction:
             await ctx.interaction.followup.send(embed=embed)
         else:
             await ctx.send(embed=embed)
+        timer.mark("send")
+
+    @suggest_book.autocomplete("topic")
+    async def topic_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Served from memory, never from Open Library
+        return self.subject_index.choices(current)
 
 async def setup(bot):
     await bot.add_cog(BookCog(bot))
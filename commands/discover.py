@@ -0,0 +1,91 @@
+# commands/discover.py
+from discord.ext import commands
+import asyncio
+import os
+from metrics import command_timer, metrics
+from admission import cache_only
+from recent_history import history_scopes
+
+class DiscoverCog(commands.Cog):
+    """One artwork, movie, book and song in a single reply, fetched concurrently."""
+    def __init__(self, bot):
+        self.bot = bot
+        # Per-source budget; a source that can't answer in time is left out of the reply
+        self.timeout = float(os.getenv("DISCOVER_TIMEOUT", "2.5"))
+
+    async def _art(self, scopes, fetch):
+        cog = self.bot.get_cog("ArtCog")
+        art = await cog.pick_artwork(scopes, fetch)
+        return cog.build_embed(art) if art else None
+
+    async def _movie(self, scopes, fetch):
+        cog = self.bot.get_cog("MovieCog")
+        if not cog.tmdb_api:
+            return None
+        _, movie = await cog.pick_movie(scopes=scopes, fetch=fetch)
+        return cog.build_embed(movie) if movie else None
+
+    async def _book(self, scopes, fetch):
+        cog = self.bot.get_cog("BookCog")
+        book = await cog.pick_book("fiction", scopes, fetch)
+        return cog.build_embed(book) if book else None
+
+    async def _song(self, scopes, fetch):
+        cog = self.bot.get_cog("SongCog")
+        if not cog.lastfm_api:
+            return None
+        song = await cog.pick_song("chill", scopes, fetch)
+        if song is None:
+            return None
+        # Only prefetched enrichment is used here; a miss is not worth holding up the reply
+        info = cog.track_info.peek(cog.track_id(song))
+        return cog.build_embed(song, "chill", info)
+
+    async def _run(self, source: str, pick, scopes, fetch: bool):
+        task = asyncio.ensure_future(pick(scopes, fetch))
+        # A timed-out source keeps going in the background so its pool is warm next time
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            embed = await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("discover_sources_total", source=source, result="timeout")
+            return None
+        except Exception:
+            # Includes the source's cog not being loaded
+            metrics.inc("discover_sources_total", source=source, result="error")
+            return None
+        metrics.inc("discover_sources_total", source=source, result="ok" if embed else "empty")
+        return embed
+
+    @commands.hybrid_command(name="discover", description="A random artwork, movie, book and song in one go")
+    async def discover(self, ctx):
+        """Show a random artwork, movie, book and song together"""
+        timer = command_timer(ctx)
+        is_interaction = getattr(ctx, "interaction", None) is not None
+        if is_interaction and not ctx.interaction.response.is_done():
+            await ctx.defer()
+        timer.mark("defer")
+
+        sources = {"art": self._art, "movie": self._movie, "book": self._book, "song": self._song}
+        scopes = history_scopes(ctx)
+        # Under overload only already-indexed candidates are used
+        fetch = not cache_only(ctx)
+        results = await asyncio.gather(*(self._run(name, pick, scopes, fetch) for name, pick in sources.items()))
+        embeds = [embed for embed in results if embed is not None]
+        timer.mark("fetch")
+
+        if not embeds:
+            if is_interaction:
+                await ctx.interaction.followup.send("❌ Couldn't discover anything right now, try again in a bit.")
+            else:
+                await ctx.send("❌ Couldn't discover anything right now, try again in a bit.")
+            return
+
+        if is_interaction:
+            await ctx.interaction.followup.send(embeds=embeds)
+        else:
+            await ctx.send(embeds=embeds)
+        timer.mark("send")
+
+async def setup(bot):
+    await bot.add_cog(DiscoverCog(bot))
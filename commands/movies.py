@@ -2,9 +2,16 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiohttp
 import os
-import random
+from candidate_pool import PoolWarmer, get_pool
+from admission import BUSY_MESSAGE, cache_only
+from media_resolver import get_media_resolver
+from recent_history import get_history, history_scopes
+from metrics import command_timer
+from prefix_index import get_prefix_index
+
+# Overridable so benchmarks can point the cog at a local stand-in
+TMDB_API_BASE = os.getenv("TMDB_API_BASE", "https://api.themoviedb.org/3")
 
 class MovieCog(commands.Cog):
     """Movie recommendations using TMDB API."""
@@ -37,26 +44,55 @@ class MovieCog(commands.Cog):
             "western": 37,
         }
 
-    @app_commands.describe(genre="TMDB genre ID or name (optional)")
-    @commands.hybrid_command(name="movie", description="Suggest a random popular movie, optionally by genre")
-    @app_commands.describe(genre="Genre name or ID (e.g., action, comedy, 18). Comma-separated supported.")
-    async def movie(self, ctx, *, genre: str = None):
-        """Suggest a random popular movie. Accepts a TMDB genre name or ID (comma-separated)."""
-        is_interaction = getattr(ctx, "interaction", None) is not None
-        if is_interaction and not ctx.interaction.response.is_done():
-            # Avoid 3s timeout for slash invocations
-            await ctx.defer()
-        if not self.tmdb_api:
-            if is_interaction:
-                await ctx.interaction.followup.send(
-                    "❌ TMDB API key is missing. Set TMDB_API_KEY in your .env to enable /movie.")
-            else:
-                await ctx.send(
-                    "❌ TMDB API key is missing. Set TMDB_API_KEY in your .env to enable /movie.")
-            return
+        # Built once: shown when a genre name can't be mapped, and served by autocomplete
+        self.valid_genres = ", ".join(sorted(set(self.genre_map.keys())))
+        self.genre_index = get_prefix_index(bot, "tmdb_genres")
+        self.genre_index.update({name: 1.0 for name in self.genre_map})
+
+        # Popular movies per genre key are indexed across many TMDB pages in the background
+        self.pool = get_pool(bot, "tmdb", max_items=500,
+                             max_pages=int(os.getenv("TMDB_MAX_PAGES", "25")))
+        self.warmer = PoolWarmer(self.pool, self.warm_keys, self.fetch_movies,
+                                 interval=float(os.getenv("WARMER_INTERVAL", "15")))
+        # Recently shown movies per channel/guild are skipped
+        self.history = get_history(bot)
+        # Posters are checked in the background; picks favour movies whose poster loads
+        self.media = get_media_resolver(bot)
+        self.media.register(self.pool.name, self.poster_variants)
 
-        url = "https://api.themoviedb.org/3/discover/movie"
+    async def cog_load(self):
+        if self.tmdb_api:
+            self.warmer.start()
 
+    async def cog_unload(self):
+        self.warmer.stop()
+
+    def warm_keys(self):
+        # "" is the unfiltered popular list; then one key per distinct genre ID
+        return [""] + sorted({str(gid) for gid in self.genre_map.values()})
+
+    async def fetch_movies(self, with_genres: str = "", page: int = 1):
+        """Fetch one page of popular movies for a comma-separated genre ID string. Returns (status, results)."""
+        url = f"{TMDB_API_BASE}/discover/movie"
+        params = {
+            "api_key": self.tmdb_api,
+            "sort_by": "popularity.desc",
+            "include_adult": "false",
+            "include_video": "false",
+            "language": "en-US",
+            "page": page,
+        }
+        if with_genres:
+            params["with_genres"] = with_genres
+
+        # Only page 1 is fetched inline; deeper pages live in the candidate index instead
+        status, data = await self.bot.http_client.get_json(url, params=params, cache="tmdb" if page == 1 else None)
+        if status != 200:
+            return status, []
+        return status, data.get("results", [])
+
+    def resolve_genres(self, genre: str = None):
+        """Map genre names/IDs (comma-separated) to a TMDB with_genres string, or None."""
         # Map provided genre names to TMDB IDs; allow IDs directly and comma-separated input
         with_genres = None
         if genre:
@@ -71,49 +107,32 @@ class MovieCog(commands.Cog):
                         mapped_ids.append(str(gid))
             if mapped_ids:
                 with_genres = ",".join(mapped_ids)
+        return with_genres
 
-        params = {
-            "api_key": self.tmdb_api,
-            "sort_by": "popularity.desc",
-            "include_adult": "false",
-            "include_video": "false",
-            "language": "en-US",
-            "page": 1,
-        }
-        if with_genres:
-            params["with_genres"] = with_genres
+    async def pick_movie(self, with_genres: str = None, scopes=(), fetch: bool = True):
+        """
+        Draw a random popular movie not recently shown in `scopes` from the candidate
+        index. Returns (status, movie); only a cold key costs an upstream round trip
+        (skipped when `fetch` is False), and movie is None if nothing was found.
+        """
+        key = with_genres or ""
+        movie = self.history.pick(self.pool, key, scopes, prefer=self.media.prefer(self.pool))
+        if movie is not None or not fetch:
+            return 200, movie
+        status, results = await self.fetch_movies(key)
+        if status != 200 or not results:
+            return status, None
+        self.pool.add(key, results, page=1)
+        return status, self.history.pick(self.pool, key, scopes)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status != 200:
-                    if is_interaction:
-                        await ctx.interaction.followup.send(f"❌ TMDB request failed ({response.status}).")
-                    else:
-                        await ctx.send(f"❌ TMDB request failed ({response.status}).")
-                    return
-                data = await response.json()
-
-        results = data.get("results", [])
-        if not results:
-            if is_interaction:
-                if genre and not with_genres:
-                    # User gave names we couldn't map
-                    valid = ", ".join(sorted(set(self.genre_map.keys())))
-                    await ctx.interaction.followup.send(
-                        "❌ No movies found. If you used names, try one of: " + valid)
-                else:
-                    await ctx.interaction.followup.send("❌ No movies found for that genre.")
-            else:
-                if genre and not with_genres:
-                    # User gave names we couldn't map
-                    valid = ", ".join(sorted(set(self.genre_map.keys())))
-                    await ctx.send(
-                        "❌ No movies found. If you used names, try one of: " + valid)
-                else:
-                    await ctx.send("❌ No movies found for that genre.")
-            return
+    def poster_variants(self, movie):
+        # w780 looks sharper in a full-width embed image; w500 is the long-standing default
+        poster_path = movie.get("poster_path")
+        if not poster_path:
+            return []
+        return [f"https://image.tmdb.org/t/p/{size}{poster_path}" for size in ("w780", "w500")]
 
-        movie = random.choice(results)
+    def build_embed(self, movie):
         title = movie.get("title") or movie.get("name") or "Unknown Title"
         overview = movie.get("overview") or "No description available"
         poster_path = movie.get("poster_path")
@@ -130,8 +149,9 @@ class MovieCog(commands.Cog):
         
         # Add movie poster image
         if poster_path:
-            poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}"
-            embed.set_image(url=poster_url)
+            poster_url = self.media.image_url(self.pool, movie, f"https://image.tmdb.org/t/p/w500{poster_path}")
+            if poster_url:
+                embed.set_image(url=poster_url)
         
         # Add additional info as fields
         embed.add_field(name="📅 Release Date", value=release_date if release_date else "N/A", inline=True)
@@ -139,11 +159,78 @@ class MovieCog(commands.Cog):
         embed.add_field(name="📊 Popularity", value=f"{popularity:.0f}", inline=True)
         
         embed.set_footer(text="🎥 Powered by TMDB", icon_url="https://www.themoviedb.org/assets/2/v4/logos/v2/blue_square_2-d537fb228cf3ded904ef09b136fe3fec72548ebc1fea3fbbd1ad9e36364db38b.svg")
+        return embed
+
+    @app_commands.describe(genre="TMDB genre ID or name (optional)")
+    @commands.hybrid_command(name="movie", description="Suggest a random popular movie, optionally by genre")
+    @app_commands.describe(genre="Genre name or ID (e.g., action, comedy, 18). Comma-separated supported.")
+    async def movie(self, ctx, *, genre: str = None):
+        """Suggest a random popular movie. Accepts a TMDB genre name or ID (comma-separated)."""
+        timer = command_timer(ctx)
+        is_interaction = getattr(ctx, "interaction", None) is not None
+        if is_interaction and not ctx.interaction.response.is_done():
+            # Avoid 3s timeout for slash invocations
+            await ctx.defer()
+        timer.mark("defer")
+        if not self.tmdb_api:
+            if is_interaction:
+                await ctx.interaction.followup.send(
+                    "❌ TMDB API key is missing. Set TMDB_API_KEY in your .env to enable /movie.")
+            else:
+                await ctx.send(
+                    "❌ TMDB API key is missing. Set TMDB_API_KEY in your .env to enable /movie.")
+            return
+
+        with_genres = self.resolve_genres(genre)
+
+        # Sample from the candidate index; only a cold key costs an upstream round trip
+        status, movie = await self.pick_movie(with_genres, history_scopes(ctx), fetch=not cache_only(ctx))
+        if status != 200:
+            if is_interaction:
+                await ctx.interaction.followup.send(f"❌ TMDB request failed ({status}).")
+            else:
+                await ctx.send(f"❌ TMDB request failed ({status}).")
+            return
+        timer.mark("fetch")
+
+        if movie is None and cache_only(ctx):
+            # Overloaded and this genre isn't indexed yet: answer fast instead of calling TMDB
+            if is_interaction:
+                await ctx.interaction.followup.send(BUSY_MESSAGE)
+            else:
+                await ctx.send(BUSY_MESSAGE)
+            return
+
+        if movie is None:
+            if is_interaction:
+                if genre and not with_genres:
+                    # User gave names we couldn't map
+                    await ctx.interaction.followup.send(
+                        "❌ No movies found. If you used names, try one of: " + self.valid_genres)
+                else:
+                    await ctx.interaction.followup.send("❌ No movies found for that genre.")
+            else:
+                if genre and not with_genres:
+                    # User gave names we couldn't map
+                    await ctx.send(
+                        "❌ No movies found. If you used names, try one of: " + self.valid_genres)
+                else:
+                    await ctx.send("❌ No movies found for that genre.")
+            return
+
+        embed = self.build_embed(movie)
+        timer.mark("parse")
         
         if is_interaction:
             await ctx.interaction.followup.send(embed=embed)
         else:
             await ctx.send(embed=embed)
+        timer.mark("send")
+
+    @movie.autocomplete("genre")
+    async def genre_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Served from memory; completes the last of several comma-separated genres
+        return self.genre_index.choices(current, separator=",")
 
 async def setup(bot):
     await bot.add_cog(MovieCog(bot))
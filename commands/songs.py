@@ -1,68 +1,170 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
+import asyncio
 import aiohttp
 import random
 import os
+from candidate_pool import PoolWarmer, get_pool
+from admission import BUSY_MESSAGE, cache_only
+from recent_history import get_history, history_scopes
+from metrics import command_timer
+from prefix_index import get_prefix_index
+from response_cache import ResponseCache
+
+# Overridable so benchmarks can point the cog at a local stand-in
+LASTFM_URL = os.getenv("LASTFM_API_URL", "https://ws.audioscrobbler.com/2.0/")
 
 class SongCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.lastfm_api = os.getenv("LASTFM_API_KEY")
 
-    @app_commands.describe(tag="Mood/genre tag, e.g., chill, rock, synth")
-    @commands.hybrid_command(name="song", description="Suggest a random song from Last.fm by tag")
-    async def suggest_song(self, ctx, *, tag: str = "chill"):
-        """Suggest a random song using Last.fm"""
-        is_interaction = getattr(ctx, "interaction", None) is not None
-        if is_interaction and not ctx.interaction.response.is_done():
-            await ctx.defer()
-        
-        # Fetch top tracks by tag
-        url = f"https://ws.audioscrobbler.com/2.0/?method=tag.gettoptracks&tag={tag}&api_key={self.lastfm_api}&format=json&limit=10"
+        # Tags kept warm in the background (comma-separated, configurable via .env)
+        self.warm_tags = [t.strip().lower() for t in os.getenv(
+            "LASTFM_WARM_TAGS", "chill,rock,indie,jazz,pop,synth,electronic,hip-hop").split(",") if t.strip()]
+        self.pool = get_pool(bot, "lastfm", id_of=self.track_id, max_items=500,
+                             max_pages=int(os.getenv("LASTFM_MAX_PAGES", "6")))
+        self.warmer = PoolWarmer(self.pool, self.warm_tags, self.fetch_tracks,
+                                 interval=float(os.getenv("WARMER_INTERVAL", "15")))
+        # Recently shown tracks per channel/guild are skipped
+        self.history = get_history(bot)
+
+        # track.getInfo results per (artist, track); kept on the bot so a cog reload doesn't drop them
+        self.track_info = getattr(bot, "track_info_cache", None)
+        if self.track_info is None:
+            self.track_info = bot.track_info_cache = ResponseCache(
+                max_entries=int(os.getenv("TRACK_INFO_CACHE_SIZE", "5000")))
+        # Tag autocomplete; Last.fm's global top tags are merged in by refresh_tags
+        self.tag_index = get_prefix_index(bot, "lastfm_tags")
+        self.tag_index.update({tag: 1.0 for tag in self.warm_tags})
+        self.enrich_batch = int(os.getenv("LASTFM_ENRICH_BATCH", "8"))
+        self.enrich_tracks.change_interval(seconds=float(os.getenv("WARMER_INTERVAL", "15")))
+        self._edit_tasks = set()
+
+    async def cog_load(self):
+        if self.lastfm_api:
+            self.warmer.start()
+            self.enrich_tracks.start()
+            self.refresh_tags.start()
+
+    async def cog_unload(self):
+        self.warmer.stop()
+        self.enrich_tracks.cancel()
+        self.refresh_tags.cancel()
+        for task in list(self._edit_tasks):
+            task.cancel()
+
+    @staticmethod
+    def track_id(track):
+        artist = (track.get("artist") or {}).get("name") or ""
+        return f"{artist.lower()}\0{(track.get('name') or '').lower()}"
+
+    async def fetch_tracks(self, tag: str, page: int = 1):
+        """Fetch one page of top tracks for a Last.fm tag. Returns (status, tracks)."""
+        params = {
+            "method": "tag.gettoptracks",
+            "tag": tag,
+            "api_key": self.lastfm_api,
+            "format": "json",
+            "limit": 50,
+            "page": page,
+        }
+        status, data = await self.bot.http_client.get_json(
+            LASTFM_URL, params=params, cache="lastfm" if page == 1 else None)
+        if status != 200:
+            return status, []
+        return status, data.get("tracks", {}).get("track", [])
+
+    async def fetch_track_info(self, song):
+        """
+        Look up album/listener stats for a track and cache them under its track_id.
+        Returns the info dict, or None if Last.fm could not be reached.
+        """
+        params = {
+            "method": "track.getInfo",
+            "api_key": self.lastfm_api,
+            "artist": (song.get("artist") or {}).get("name"),
+            "track": song.get("name"),
+            "format": "json",
+        }
+        status, track_data = await self.bot.http_client.get_json(LASTFM_URL, params=params)
+        if status != 200 or track_data is None:
+            return None
+
+        track = track_data.get("track", {})
+        info = {
+            "album_name": None,
+            "album_art": None,
+            "listeners": track.get("listeners"),
+            "playcount": track.get("playcount"),
+        }
+        album = track.get("album")
+        if album:
+            info["album_name"] = album.get("title")
+            # Get the largest image (extralarge or mega)
+            for img in reversed(album.get("image", [])):
+                if img.get("#text"):
+                    info["album_art"] = img.get("#text")
+                    break
+
+        # Tracks Last.fm knows nothing about are cached too, so they aren't refetched
+        self.track_info.store(self.track_id(song), info, "lastfm_info")
+        return info
+
+    @tasks.loop(seconds=15)
+    async def enrich_tracks(self):
+        """Enrich a batch of indexed tracks ahead of demand, most recently requested tags first."""
+        batch = []
+        for key in reversed(self.pool.keys()):
+            tracks = self.pool.items(key)
+            for song in random.sample(tracks, min(len(tracks), self.enrich_batch * 2)):
+                if self.track_info.peek(self.track_id(song)) is None:
+                    batch.append(song)
+                if len(batch) >= self.enrich_batch:
+                    break
+            if len(batch) >= self.enrich_batch:
+                break
+        if batch:
+            await asyncio.gather(*(self.fetch_track_info(song) for song in batch), return_exceptions=True)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                data = await response.json()
+    async def pick_song(self, tag: str, scopes=(), fetch: bool = True):
+        """
+        Draw a random top track for a tag, not recently shown in `scopes`, from the
+        index; fetch inline only when the pool is cold (and `fetch` allows it).
+        """
+        key = tag.lower()
+        song = self.history.pick(self.pool, key, scopes)
+        if song is None and fetch:
+            _, tracks = await self.fetch_tracks(key)
+            if not tracks:
+                return None
+            self.pool.add(key, tracks, page=1)
+            song = self.history.pick(self.pool, key, scopes)
+        return song
 
-        tracks = data.get("tracks", {}).get("track", [])
-        if not tracks:
-            await ctx.send("❌ No songs found.")
+    @tasks.loop(hours=6)
+    async def refresh_tags(self):
+        """Merge Last.fm's most used tags into the autocomplete index."""
+        params = {"method": "tag.getTopTags", "api_key": self.lastfm_api, "format": "json"}
+        status, data = await self.bot.http_client.get_json(LASTFM_URL, params=params, cache="lastfm")
+        if status != 200 or data is None:
             return
+        tags = data.get("toptags", {}).get("tag", [])
+        terms = {t["name"]: float(t.get("count") or 0) for t in tags if t.get("name")}
+        # Tags people actually asked for rank alongside the global ones
+        terms.update({key: max(terms.get(key, 0.0), 1.0) for key in self.pool.keys()})
+        self.tag_index.update(terms)
 
-        song = random.choice(tracks)
+    def build_embed(self, song, tag: str, info: dict = None):
         name = song.get("name")
         artist_name = song.get("artist", {}).get("name")
         song_url = song.get("url")
-        
-        # Try to get additional track info including album art
-        track_info_url = f"https://ws.audioscrobbler.com/2.0/?method=track.getInfo&api_key={self.lastfm_api}&artist={artist_name}&track={name}&format=json"
-        
-        album_name = None
-        album_art = None
-        listeners = None
-        playcount = None
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(track_info_url) as response:
-                if response.status == 200:
-                    track_data = await response.json()
-                    track = track_data.get("track", {})
-                    
-                    # Get album info
-                    album = track.get("album")
-                    if album:
-                        album_name = album.get("title")
-                        images = album.get("image", [])
-                        # Get the largest image (extralarge or mega)
-                        for img in reversed(images):
-                            if img.get("#text"):
-                                album_art = img.get("#text")
-                                break
-                    
-                    # Get stats
-                    listeners = track.get("listeners")
-                    playcount = track.get("playcount")
+        info = info or {}
+        album_name = info.get("album_name")
+        album_art = info.get("album_art")
+        listeners = info.get("listeners")
+        playcount = info.get("playcount")
 
         # Create aesthetic embed with album art
         embed = discord.Embed(
@@ -85,11 +187,55 @@ class SongCog(commands.Cog):
         
         embed.add_field(name="🏷️ Tag", value=tag.capitalize(), inline=True)
         embed.set_footer(text="🎶 Powered by Last.fm", icon_url="https://www.last.fm/static/images/lastfm_avatar_twitter.52a5d69a85ac.png")
+        return embed
+
+    async def _enrich_and_edit(self, message, song, tag: str):
+        # Runs after the basic reply is out; fills in album art and stats in place
+        try:
+            info = await self.fetch_track_info(song)
+            if info and (info["album_art"] or info["album_name"] or info["listeners"] or info["playcount"]):
+                await message.edit(embed=self.build_embed(song, tag, info))
+        except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError):
+            pass
+
+    @app_commands.describe(tag="Mood/genre tag, e.g., chill, rock, synth")
+    @commands.hybrid_command(name="song", description="Suggest a random song from Last.fm by tag")
+    async def suggest_song(self, ctx, *, tag: str = "chill"):
+        """Suggest a random song using Last.fm"""
+        timer = command_timer(ctx)
+        is_interaction = getattr(ctx, "interaction", None) is not None
+        if is_interaction and not ctx.interaction.response.is_done():
+            await ctx.defer()
+        timer.mark("defer")
         
+        # Sample from the indexed top tracks for this tag; fetch inline only when the pool is cold
+        song = await self.pick_song(tag, history_scopes(ctx), fetch=not cache_only(ctx))
+        if song is None:
+            await ctx.send(BUSY_MESSAGE if cache_only(ctx) else "❌ No songs found.")
+            return
+        timer.mark("fetch")
+
+        # Enrichment is normally prefetched; on a miss reply now and edit the embed when it arrives
+        info, _ = self.track_info.lookup(self.track_id(song), "lastfm_info")
+        embed = self.build_embed(song, tag, info)
+        timer.mark("parse")
+
         if is_interaction:
-            await ctx.interaction.followup.send(embed=embed)
+            message = await ctx.interaction.followup.send(embed=embed)
         else:
-            await ctx.send(embed=embed)
+            message = await ctx.send(embed=embed)
+        timer.mark("send")
+
+        # Skipped under overload: the follow-up edit is one more upstream call
+        if info is None and message is not None and not cache_only(ctx):
+            task = asyncio.create_task(self._enrich_and_edit(message, song, tag))
+            self._edit_tasks.add(task)
+            task.add_done_callback(self._edit_tasks.discard)
+
+    @suggest_song.autocomplete("tag")
+    async def tag_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Served from memory, never from Last.fm
+        return self.tag_index.choices(current)
 
 async def setup(bot):
     await bot.add_cog(SongCog(bot))
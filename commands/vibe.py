@@ -1,36 +1,130 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
-import random
+import os
+from collections import deque
+from candidate_pool import add_pool_listener, remove_pool_listener
+from metrics import command_timer
+from vibe_index import VibeIndex, MOOD_TERMS, EXPANSION_WEIGHT
+
+# Hand-picked starters; they keep /vibe useful before any pool has been indexed
+SEED_VIBES = {
+    "chill": ["🎥 Before Sunrise", "🎵 Lofi Beats", "📖 Norwegian Wood"],
+    "nostalgic": ["🎥 Mid90s", "🎵 Somebody Else - The 1975", "📖 Eternal Sunshine"],
+    "creative": ["🎥 Inception", "🎮 Life is Strange", "📖 Steal Like an Artist"]
+}
 
 class VibeCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    @app_commands.describe(mood="Pick a vibe: chill, nostalgic, creative")
+        # The index lives on the bot so a cog reload doesn't drop it
+        self.index = getattr(bot, "vibe_index", None)
+        if self.index is None:
+            self.index = bot.vibe_index = VibeIndex(
+                dim=int(os.getenv("VIBE_INDEX_DIM", "256")),
+                max_items=int(os.getenv("VIBE_INDEX_SIZE", "20000")))
+            for mood, items in SEED_VIBES.items():
+                terms = [(mood, 2.0)] + [(t, EXPANSION_WEIGHT) for t in MOOD_TERMS.get(mood, ())]
+                for label in items:
+                    self.index.add("seed", label, label, terms)
+
+        # (pool, key, items) waiting to be indexed; drained in small batches off the command path
+        self._pending = deque()
+        self.index_batch = int(os.getenv("VIBE_INDEX_BATCH", "500"))
+
+    async def cog_load(self):
+        add_pool_listener(self.bot, self.on_candidates)
+        # Pick up whatever the pools already hold (e.g. after a hot reload)
+        for pool in list(getattr(self.bot, "candidate_pools", {}).values()):
+            for key in pool.keys():
+                self._pending.append((pool, key, list(pool.items(key))))
+        self.index_pending.start()
+
+    async def cog_unload(self):
+        remove_pool_listener(self.bot, self.on_candidates)
+        self.index_pending.cancel()
+
+    def on_candidates(self, pool, key, items):
+        self._pending.append((pool, key, items))
+
+    def describe(self, pool, key: str, item, genre_names: dict):
+        """Map a pool candidate to (kind, id, label, weighted terms), or None to skip it."""
+        if pool.name == "tmdb":
+            title = item.get("title") or item.get("name")
+            if not title:
+                return None
+            # A genre ID can have several names (878: "science fiction" and "sci-fi"); use them all
+            terms = [(name, 2.0) for gid in item.get("genre_ids") or [] for name in genre_names.get(gid, ())]
+            return "movie", pool.id_of(item), f"🎥 {title}", terms + [(title, 0.5)]
+        if pool.name == "lastfm":
+            name = item.get("name")
+            artist = (item.get("artist") or {}).get("name")
+            if not name:
+                return None
+            label = f"🎵 {name} - {artist}" if artist else f"🎵 {name}"
+            return "song", pool.id_of(item), label, [(key, 3.0), (name, 0.5), (artist or "", 0.5)]
+        if pool.name == "openlibrary":
+            title = item.get("title")
+            if not title:
+                return None
+            terms = [(key, 3.0)] + [(s, 1.5) for s in (item.get("subject") or [])[:10]]
+            return "book", pool.id_of(item), f"📖 {title}", terms + [(title, 0.5)]
+        if pool.name == "aic":
+            title = item.get("title")
+            if not title:
+                return None
+            terms = [(item.get("artwork_type_title") or "", 1.5), (item.get("place_of_origin") or "", 1.0),
+                     (title, 1.0), (item.get("artist_title") or "", 0.5)]
+            return "art", pool.id_of(item), f"🎨 {title}", terms
+        return None
+
+    @tasks.loop(seconds=2)
+    async def index_pending(self):
+        """Index newly fetched candidates, at most `index_batch` per tick."""
+        if not self._pending:
+            return
+        movies = self.bot.get_cog("MovieCog")
+        genre_names = {}
+        for name, gid in (movies.genre_map.items() if movies else ()):
+            genre_names.setdefault(gid, []).append(name)
+        budget = self.index_batch
+        while self._pending and budget > 0:
+            pool, key, items = self._pending.popleft()
+            if len(items) > budget:
+                self._pending.appendleft((pool, key, items[budget:]))
+                items = items[:budget]
+            for item in items:
+                entry = self.describe(pool, key, item, genre_names)
+                if entry:
+                    self.index.add(*entry)
+            budget -= len(items)
+
+    @app_commands.describe(mood="Any vibe, e.g. chill, nostalgic, rainy sunday, dark")
     @commands.hybrid_command(name="vibe", description="Suggest media for a vibe")
-    async def vibe(self, ctx, mood: str):
+    async def vibe(self, ctx, *, mood: str):
         """Suggest media for a vibe"""
+        timer = command_timer(ctx)
         is_interaction = getattr(ctx, "interaction", None) is not None
         if is_interaction and not ctx.interaction.response.is_done():
             await ctx.defer()
-        vibes = {
-            "chill": ["🎥 Before Sunrise", "🎵 Lofi Beats", "📖 Norwegian Wood"],
-            "nostalgic": ["🎥 Mid90s", "🎵 Somebody Else - The 1975", "📖 Eternal Sunshine"],
-            "creative": ["🎥 Inception", "🎮 Life is Strange", "📖 Steal Like an Artist"]
-        }
-
-        if mood.lower() not in vibes:
-            await ctx.send("Available vibes: chill, nostalgic, creative")
+        timer.mark("defer")
+
+        # Nearest indexed movies/songs/books/art for the mood; CPU only, no upstream calls
+        matches = self.index.query(mood)
+        if not matches:
+            await ctx.send("🤔 Nothing matches that vibe yet. Try: " + ", ".join(sorted(MOOD_TERMS)))
             return
 
-        items = "\n".join(vibes[mood.lower()])
-        embed = discord.Embed(title=f"🎧 Vibe: {mood}", description=items, color=0xffa047)
-        
+        items = "\n".join(label for _, label, _ in matches)
+        embed = discord.Embed(title=f"🎧 Vibe: {mood}"[:256], description=items, color=0xffa047)
+        timer.mark("parse")
+
         if is_interaction:
             await ctx.interaction.followup.send(embed=embed)
         else:
             await ctx.send(embed=embed)
+        timer.mark("send")
 
 async def setup(bot):
     await bot.add_cog(VibeCog(bot))
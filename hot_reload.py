@@ -0,0 +1,104 @@
+# hot_reload.py
+import asyncio
+import logging
+import os
+import time
+
+import discord
+from discord.ext import commands, tasks
+
+from command_sync import command_payloads, sync_changed_commands
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+class ExtensionWatcher:
+    """
+    Polls the command modules' mtimes and reloads changed extensions in place.
+
+    bot.reload_extension rolls back to the old module when the new one fails
+    to import or set up, so a broken save never takes a command offline.
+    Everything kept on the bot (HTTP client, caches, candidate pools) survives
+    a reload because cogs look it up there in __init__. Only the app commands
+    whose payload actually changed are pushed to Discord.
+    """
+
+    def __init__(self, bot, folder: str = "commands", interval: float = 2.0,
+                 sync: bool = True, guild=None, store=None):
+        self.bot = bot
+        self.folder = folder
+        self.sync = sync
+        self.guild = guild
+        self.store = store
+        self.reloads = 0
+        self.failures = 0
+        self._mtimes = {}
+        self._loop = tasks.loop(seconds=interval)(self._tick)
+
+    def _scan(self) -> dict:
+        mtimes = {}
+        for filename in os.listdir(self.folder):
+            if not filename.endswith(".py") or filename.startswith("_"):
+                continue
+            try:
+                mtimes[f"{self.folder}.{filename[:-3]}"] = os.stat(os.path.join(self.folder, filename)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return mtimes
+
+    async def start(self):
+        self._mtimes = await asyncio.to_thread(self._scan)
+        if not self._loop.is_running():
+            self._loop.start()
+
+    def stop(self):
+        self._loop.cancel()
+
+    async def _tick(self):
+        current = await asyncio.to_thread(self._scan)
+        changed = [name for name, mtime in current.items() if self._mtimes.get(name) != mtime]
+        removed = [name for name in self._mtimes if name not in current]
+        self._mtimes = current
+        for name in changed:
+            await self.reload(name)
+        for name in removed:
+            await self.reload(name, removed=True)
+
+    async def reload(self, name: str, removed: bool = False) -> bool:
+        """(Re)load, or unload when `removed`, one extension and push its command changes."""
+        targets = [None] + ([self.guild] if self.guild else [])
+        before = {guild: command_payloads(self.bot.tree, guild) for guild in targets}
+        started = time.perf_counter()
+        try:
+            if removed:
+                if name in self.bot.extensions:
+                    await self.bot.unload_extension(name)
+            elif name in self.bot.extensions:
+                await self.bot.reload_extension(name)
+            else:
+                await self.bot.load_extension(name)
+        except commands.ExtensionError as e:
+            self.failures += 1
+            metrics.inc("extension_reloads_total", module=name, status="failed")
+            log.error(f"❌ Reloading {name} failed; keeping the previous version: {e}")
+            return False
+        self.reloads += 1
+        metrics.inc("extension_reloads_total", module=name, status="ok")
+        log.info(f"♻️ {'Unloaded' if removed else 'Reloaded'} {name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        if self.sync:
+            for guild in targets:
+                try:
+                    upserted, deleted = await sync_changed_commands(self.bot, before[guild], guild=guild,
+                                                                    store=self.store)
+                except discord.HTTPException as e:
+                    log.error(f"❌ Failed to sync commands changed by {name}: {e}")
+                    continue
+                if upserted or deleted:
+                    where = f"guild {guild.id}" if guild else "globally"
+                    log.info(f"🔁 Updated {upserted} and removed {deleted} application commands {where}.")
+        return True
+
+    def stats(self) -> dict:
+        return {"modules": len(self._mtimes), "reloads": self.reloads, "failures": self.failures}
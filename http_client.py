@@ -0,0 +1,268 @@
+# http_client.py
+import aiohttp
+import asyncio
+import contextvars
+import os
+import time
+from urllib.parse import urlsplit
+
+from logs import span
+from metrics import metrics
+from rate_limit import RateLimiter, parse_retry_after
+
+# Statuses worth retrying after a pause; anything else is returned to the caller
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    Shared aiohttp client used by every cog.
+
+    One ClientSession backed by a keep-alive TCPConnector, so repeated
+    commands reuse warm TCP/TLS connections and cached DNS lookups instead
+    of paying a fresh handshake per invocation. When a ResponseCache is
+    attached, get_json(..., cache=source) serves repeated requests locally.
+
+    Every network request passes through a per-host RateLimiter, backs off on
+    429/5xx (honouring Retry-After) and is coalesced with identical requests
+    already in flight, so a burst of the same command makes one upstream call.
+    """
+
+    def __init__(self, limit: int = None, limit_per_host: int = None,
+                 dns_ttl: int = None, keepalive_timeout: float = None,
+                 timeout: float = None, cache=None, limiter: RateLimiter = None,
+                 max_retries: int = 2, max_retry_wait: float = 10.0, shared_store=None):
+        self.limit = limit or int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host = limit_per_host or int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+        self.dns_ttl = dns_ttl or int(os.getenv("HTTP_DNS_TTL", "300"))
+        self.keepalive_timeout = keepalive_timeout or float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+        self.timeout = timeout or float(os.getenv("HTTP_TIMEOUT", "10"))
+
+        self.cache = cache
+        # Optional SharedStore behind the in-process cache (multi-process mode)
+        self.shared_store = shared_store
+        self._store_writes = set()
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.session = None
+        self._connector = None
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        # (url, params) -> task for requests currently on the wire (singleflight)
+        self._inflight = {}
+        # Cache keys with a stale-while-revalidate refresh already running
+        self._refreshing = {}
+
+    async def start(self):
+        """Create the pooled session. Must be called from the running event loop."""
+        if self.session is not None and not self.session.closed:
+            return
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=self._connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout, connect=min(5.0, self.timeout)),
+            headers={"User-Agent": "CPG-Discord-Bot (+https://github.com/ByapakSigdel/CPG-Discord-Bot)"},
+        )
+
+    async def close(self):
+        """Close the session and every pooled connection."""
+        for task in list(self._refreshing.values()) + list(self._inflight.values()):
+            task.cancel()
+        self._refreshing.clear()
+        self._inflight.clear()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self._connector = None
+
+    async def get_json(self, url: str, params: dict = None, cache: str = None):
+        """
+        GET `url` and decode the JSON body.
+        Returns (status, data); data is None for non-200 responses.
+
+        `cache` names the upstream source (e.g. "tmdb") whose TTL applies;
+        leave it unset to always go to the network.
+        """
+        if cache is None or self.cache is None:
+            return await self._fetch_json(url, params)
+
+        key = self.cache.make_key(url, params)
+        data, state = self.cache.lookup(key, cache)
+        if state == self.cache.STALE:
+            self._schedule_refresh(key, url, params, cache)
+        if state is not None:
+            return 200, data
+
+        if self.shared_store is not None:
+            # Another worker may already have fetched this
+            hit = await asyncio.to_thread(self.shared_store.get_response, key)
+            if hit is not None:
+                data, fresh_until, stale_until = hit
+                now = time.time()
+                self.cache.store(key, data, cache, fresh_for=fresh_until - now, stale_for=stale_until - now)
+                if fresh_until <= now:
+                    self._schedule_refresh(key, url, params, cache)
+                return 200, data
+
+        status, data = await self._fetch_json(url, params)
+        if status == 200 and data is not None:
+            self._store(key, data, cache)
+        return status, data
+
+    def _store(self, key: str, data, source: str):
+        self.cache.store(key, data, source)
+        if self.shared_store is not None:
+            task = asyncio.create_task(asyncio.to_thread(
+                self.shared_store.put_response, key, data, source, self.cache.ttl_for(source)))
+            self._store_writes.add(task)
+            task.add_done_callback(self._store_writes.discard)
+
+    def _schedule_refresh(self, key: str, url: str, params: dict, source: str):
+        if key in self._refreshing:
+            return
+        # Fresh context: the refresh isn't part of the command that happened to trigger it.
+        # (create_task's context= argument is 3.11+; the task copies the context it is created in.)
+        task = contextvars.Context().run(asyncio.create_task, self._refresh(key, url, params, source))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, key: str, url: str, params: dict, source: str):
+        try:
+            status, data = await self._fetch_json(url, params)
+        except Exception:
+            # Keep serving the stale copy; the next lookup will retry
+            return
+        if status == 200 and data is not None:
+            self._store(key, data, source)
+
+    async def _fetch_json(self, url: str, params: dict = None):
+        key = (url, tuple(sorted((params or {}).items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_json(url, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._request_done(key, t))
+            return await asyncio.shield(task)
+        self.coalesced += 1
+        # Shield so one cancelled caller doesn't cancel the request others are waiting on.
+        # The request's own span lands on the first caller's trace; waiters get this one.
+        started = time.perf_counter()
+        try:
+            return await asyncio.shield(task)
+        finally:
+            span("upstream_wait", time.perf_counter() - started, host=urlsplit(url).hostname or "", coalesced=True)
+
+    def _request_done(self, key, task):
+        self._inflight.pop(key, None)
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def _request_json(self, url: str, params: dict = None):
+        if self.session is None or self.session.closed:
+            await self.start()
+        host = urlsplit(url).hostname or ""
+        attempt = 0
+        while True:
+            await self.limiter.acquire(host)
+            self.requests += 1
+            started = time.perf_counter()
+            try:
+                async with self.session.get(url, params=params) as response:
+                    status = response.status
+                    if status == 200:
+                        # Some upstreams (Open Library) send JSON with a text/plain content type
+                        data = await response.json(content_type=None)
+                        self._record(host, status, started)
+                        return status, data
+                    retry_after = response.headers.get("Retry-After")
+                self._record(host, status, started)
+            except Exception:
+                self.errors += 1
+                self._record(host, "error", started)
+                raise
+
+            if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                return status, None
+            wait = parse_retry_after(retry_after, default=2.0 ** attempt)
+            if wait > self.max_retry_wait:
+                # Upstream wants us gone for longer than a command can wait
+                await self.limiter.backoff(host, wait)
+                return status, None
+            if status == 429:
+                # Pause the whole host, not just this request
+                await self.limiter.backoff(host, wait)
+            else:
+                await asyncio.sleep(wait)
+            attempt += 1
+            self.retries += 1
+
+    async def head(self, url: str):
+        """
+        HEAD `url`, following redirects, without retries or caching.
+        Returns (status, content_type); status is None if the request failed.
+        """
+        if self.session is None or self.session.closed:
+            await self.start()
+        host = urlsplit(url).hostname or ""
+        await self.limiter.acquire(host)
+        self.requests += 1
+        started = time.perf_counter()
+        try:
+            async with self.session.head(url, allow_redirects=True) as response:
+                self._record(host, response.status, started)
+                return response.status, response.headers.get("Content-Type", "")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            self._record(host, "error", started)
+            return None, ""
+
+    @staticmethod
+    def _record(host: str, status, started: float):
+        seconds = time.perf_counter() - started
+        metrics.observe("upstream_request_seconds", seconds, host=host)
+        # Links a slow command to the upstream call that made it slow
+        span("upstream", seconds, host=host, status=status)
+        metrics.inc("upstream_responses_total", host=host, status=status)
+
+    def stats(self) -> dict:
+        """Snapshot of the connection pool for inspection/debugging."""
+        connector = self._connector
+        stats = {
+            "open": self.session is not None and not self.session.closed,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "dns_ttl": self.dns_ttl,
+            "keepalive_timeout": self.keepalive_timeout,
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "in_use": 0,
+            "idle": 0,
+            "hosts": {},
+        }
+        if connector is None:
+            return stats
+
+        # aiohttp does not expose pool counters publicly; read them defensively
+        idle_conns = getattr(connector, "_conns", {}) or {}
+        acquired = getattr(connector, "_acquired", set()) or set()
+        acquired_per_host = getattr(connector, "_acquired_per_host", {}) or {}
+        stats["in_use"] = len(acquired)
+        stats["idle"] = sum(len(conns) for conns in idle_conns.values())
+        for key in set(idle_conns) | set(acquired_per_host):
+            host = f"{key.host}:{key.port}"
+            entry = stats["hosts"].setdefault(host, {"idle": 0, "in_use": 0})
+            entry["idle"] += len(idle_conns.get(key, ()))
+            entry["in_use"] += len(acquired_per_host.get(key, ()))
+        return stats
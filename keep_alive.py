@@ -1,15 +1,86 @@
-from flask import Flask
-from threading import Thread
+import math
+import os
+import time
+from aiohttp import web
+from metrics import metrics
 
-app = Flask('')
+# Readiness fails when the event loop falls this far behind (seconds)
+MAX_LOOP_LAG = float(os.getenv("HEALTH_MAX_LOOP_LAG", "1.0"))
 
-@app.route('/')
-def home():
-    return "☕ Chiya Pop Guff Bot is alive!"
+def _shard_latencies(bot):
+    # AutoShardedBot exposes per-shard latencies; a plain Bot has a single connection
+    latencies = getattr(bot, "latencies", None)
+    if latencies is None:
+        latencies = [(getattr(bot, "shard_id", None) or 0, bot.latency)]
+    return {str(shard_id): (None if math.isinf(lat) or math.isnan(lat) else round(lat, 4))
+            for shard_id, lat in latencies}
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
+def health_report(bot) -> dict:
+    """Current gateway/loop health as seen from inside the bot's event loop."""
+    loop_lag = metrics.get("event_loop_lag_last_seconds") or 0.0
+    shards = _shard_latencies(bot)
+    ready = (
+        bot.is_ready()
+        and not bot.is_closed()
+        and all(lat is not None for lat in shards.values())
+        and loop_lag < MAX_LOOP_LAG
+    )
+    return {
+        "ready": ready,
+        "gateway_connected": bot.is_ready() and not bot.is_closed(),
+        "shards": shards,
+        "loop_lag_seconds": round(loop_lag, 4),
+        "guilds": len(bot.guilds),
+        "uptime_seconds": round(time.monotonic() - bot.started_at, 1) if hasattr(bot, "started_at") else None,
+    }
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+def create_app(bot) -> web.Application:
+    app = web.Application()
+
+    async def home(request):
+        return web.Response(text="☕ Chiya Pop Guff Bot is alive!")
+
+    async def liveness(request):
+        # Answering at all proves the event loop is running
+        return web.json_response({"alive": True, "loop_lag_seconds": metrics.get("event_loop_lag_last_seconds")})
+
+    async def readiness(request):
+        report = health_report(bot)
+        return web.json_response(report, status=200 if report["ready"] else 503)
+
+    async def prometheus_metrics(request):
+        # Prometheus text exposition format
+        return web.Response(body=metrics.render_prometheus().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def metrics_summary(request):
+        # Human-friendly summary: counters, gauges and p50/p99 per latency series
+        report = dict(metrics.summary(), health=health_report(bot))
+        admission = getattr(bot, "admission", None)
+        if admission is not None:
+            report["admission"] = admission.stats()
+        return web.json_response(report)
+
+    app.router.add_get("/", home)
+    app.router.add_get("/healthz", liveness)
+    app.router.add_get("/readyz", readiness)
+    app.router.add_get("/metrics", prometheus_metrics)
+    app.router.add_get("/metrics.json", metrics_summary)
+    return app
+
+async def start_keep_alive(bot, host: str = "0.0.0.0", port: int = None) -> web.AppRunner:
+    """Serve health and metrics endpoints on the bot's own event loop."""
+    port = port or int(os.getenv("PORT", "8080"))
+    runner = web.AppRunner(create_app(bot), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    try:
+        await site.start()
+    except OSError:
+        await runner.cleanup()
+        raise
+    return runner
+
+async def stop_keep_alive(runner: web.AppRunner):
+    # Lets in-flight health checks finish, then closes the listening socket
+    await runner.cleanup()
@@ -0,0 +1,193 @@
+# logs.py
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import secrets
+import sys
+import time
+
+# The command invocation (Trace) the current task is working for, if any.
+# asyncio tasks copy it when created, so upstream fetches started by a command
+# carry the command's trace id; a command that joins another caller's in-flight
+# request records an "upstream_wait" span instead (see HttpClient._fetch_json).
+current_trace = contextvars.ContextVar("cpg_trace", default=None)
+
+_listener = None
+_handler = None
+
+
+class Trace:
+    """
+    One command invocation: a trace id plus its timed spans (defer, each
+    upstream request, parse, send). Spans are buffered and written as a single
+    log line when the command finishes, so sampling can keep every slow or
+    failed command whole while dropping most of the fast ones.
+    """
+
+    __slots__ = ("trace_id", "name", "started", "sampled", "spans", "finished")
+
+    MAX_SPANS = 64
+
+    def __init__(self, name: str, sampled: bool):
+        self.trace_id = secrets.token_hex(8)
+        self.name = name
+        self.started = time.perf_counter()
+        self.sampled = sampled
+        self.spans = []
+        self.finished = False
+
+    def span(self, name: str, seconds: float = None, **fields):
+        if len(self.spans) >= self.MAX_SPANS:
+            return
+        entry = {"span": name, "at_ms": round((time.perf_counter() - self.started) * 1000, 1)}
+        if seconds is not None:
+            entry["ms"] = round(seconds * 1000, 1)
+        entry.update(fields)
+        self.spans.append(entry)
+
+
+def start_trace(name: str) -> Trace:
+    """Begin a trace for the current task; sampled at LOG_TRACE_SAMPLE."""
+    trace = Trace(name, sampled=random.random() < float(os.getenv("LOG_TRACE_SAMPLE", "0.1")))
+    current_trace.set(trace)
+    return trace
+
+
+def span(name: str, seconds: float = None, **fields):
+    """Record a span on the current task's trace; a no-op outside a command."""
+    trace = current_trace.get()
+    if trace is not None and not trace.finished:
+        trace.span(name, seconds, **fields)
+
+
+def finish_trace(trace: Trace, status: str = "ok", **fields):
+    """
+    Write the trace's summary line if it was sampled, failed or took longer
+    than LOG_SLOW_MS; safe to call more than once.
+    """
+    if trace is None or trace.finished:
+        return
+    trace.finished = True
+    seconds = time.perf_counter() - trace.started
+    slow = seconds * 1000 >= float(os.getenv("LOG_SLOW_MS", "1500"))
+    if not (trace.sampled or slow or status != "ok"):
+        return
+    logging.getLogger("cpg.trace").log(
+        logging.WARNING if status != "ok" or slow else logging.INFO,
+        "%s %s in %.0fms", trace.name, status, seconds * 1000,
+        extra={"fields": dict(fields, command=trace.name, status=status, ms=round(seconds * 1000, 1),
+                              slow=slow, spans=trace.spans)},
+    )
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace id and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        worker = os.getenv("WORKER_ID")
+        if worker:
+            entry["worker"] = int(worker)
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local runs (LOG_FORMAT=text)."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            line += f" [trace {trace_id}]"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + json.dumps(fields, ensure_ascii=False, default=str)
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the event loop: the record is stamped with
+    the current trace id and handed to the listener thread, and when the queue
+    is full it is dropped (and counted) instead.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not hasattr(record, "trace_id"):
+            trace = current_trace.get()
+            record.trace_id = trace.trace_id if trace is not None else None
+        # Render here, while args and the exception are still live; formatting
+        # into JSON/text happens on the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level: str = None, fmt: str = None, queue_size: int = None):
+    """
+    Route every logger (ours and discord.py's) through a bounded queue to a
+    stdout writer thread. LOG_LEVEL, LOG_FORMAT (json|text) and LOG_QUEUE_SIZE
+    configure it; calling it again is a no-op.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    log_queue = queue.Queue(maxsize=queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+    _handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped() -> int:
+    """Log records dropped because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
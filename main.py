@@ -1,73 +1,232 @@
 # main.py
+import time
+# Time-to-ready is measured from here
+STARTED = time.perf_counter()
 import discord
 from discord.ext import commands
 import os
 import asyncio
 import importlib
+import importlib.util
 import inspect
+import logging
+import math
+import signal
+import yarl
 from dotenv import load_dotenv
-from keep_alive import keep_alive  # keep_alive.py from earlier
+from keep_alive import start_keep_alive, stop_keep_alive
+from http_client import HttpClient
+from response_cache import ResponseCache
+from rate_limit import RateLimiter, SharedRateLimiter
+from shared_store import SharedStore
+from snapshot_store import SnapshotStore, Snapshotter
+from metrics import metrics, command_timer, watch_event_loop, StartupTimeline
+from command_sync import sync_if_changed
+from hot_reload import ExtensionWatcher
+from admission import CommandThrottled, get_admission
+from logs import setup_logging, start_trace, finish_trace, dropped as dropped_log_records
+from media_resolver import get_media_resolver
 
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 
+# Structured logs go through a queue to a writer thread, never blocking the event loop
+setup_logging()
+log = logging.getLogger("main")
+
 # Intents: message_content is required to receive prefix-based commands
 intents = discord.Intents.default()
 intents.message_content = True
 
+# Local testing against tools/fake_gateway.py instead of the real Discord API
+if os.getenv("DISCORD_API_BASE"):
+    discord.http.Route.BASE = os.getenv("DISCORD_API_BASE")
+if os.getenv("DISCORD_GATEWAY_URL"):
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(os.getenv("DISCORD_GATEWAY_URL"))
+
+# Set by supervisor.py when running as one of several worker processes
+WORKER_ID = int(os.getenv("WORKER_ID", "0"))
+
+def build_bot():
+    """
+    Single-connection Bot by default. SHARD_MODE=auto (or SHARD_COUNT/SHARD_IDS)
+    switches to AutoShardedBot; with SHARD_IDS this process only runs those shards.
+    """
+    shard_ids = os.getenv("SHARD_IDS")
+    shard_count = os.getenv("SHARD_COUNT")
+    if not (shard_ids or shard_count or os.getenv("SHARD_MODE") == "auto"):
+        return commands.Bot(command_prefix="!", intents=intents)
+    return commands.AutoShardedBot(
+        command_prefix="!",
+        intents=intents,
+        shard_ids=[int(s) for s in shard_ids.split(",")] if shard_ids else None,
+        shard_count=int(shard_count) if shard_count else None,
+    )
+
 # Use a non-slash text prefix for hybrid commands (slash commands will show under /)
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = build_bot()
 
 # Guard to sync application commands once per process start
 _synced = False
+startup = StartupTimeline(STARTED)
 
 @bot.event
 async def on_ready():
     global _synced
-    print(f"✅ Logged in as {bot.user} (ID: {bot.user.id})")
+    log.info(f"✅ Logged in as {bot.user} (ID: {bot.user.id})")
     # Debug: show loaded cogs and commands
     try:
-        print(f"🔧 Loaded cogs: {list(bot.cogs.keys())}")
-        print("🔧 Loaded commands:", ", ".join(sorted(cmd.qualified_name for cmd in bot.commands)))
+        log.debug(f"🔧 Loaded cogs: {list(bot.cogs.keys())}")
+        log.debug("🔧 Loaded commands: " + ", ".join(sorted(cmd.qualified_name for cmd in bot.commands)))
     except Exception as e:
-        print(f"(debug) failed to list cogs/commands: {e}")
+        log.debug(f"failed to list cogs/commands: {e}")
     if not _synced:
+        startup.mark("gateway")
+    # Application commands are global: with several workers only worker 0 syncs them
+    if not _synced and WORKER_ID == 0:
+        # Skipped when the command tree is unchanged since the last sync (FORCE_COMMAND_SYNC=1 overrides)
+        snapshotter = getattr(bot, "snapshotter", None)
+        store = snapshotter.store if snapshotter else None
+        force = os.getenv("FORCE_COMMAND_SYNC") == "1"
         # Optionally fast-sync to a specific guild for immediate availability
         guild_id = os.getenv("DISCORD_GUILD_ID")
         try:
             if guild_id:
                 guild = discord.Object(id=int(guild_id))
-                gsynced = await bot.tree.sync(guild=guild)
-                print(f"⚡ Synced {len(gsynced)} commands to guild {guild_id}.")
+                gsynced = await sync_if_changed(bot, guild=guild, store=store, force=force)
+                if gsynced is None:
+                    log.info(f"⏭️ Guild {guild_id} commands unchanged; sync skipped.")
+                else:
+                    log.info(f"⚡ Synced {len(gsynced)} commands to guild {guild_id}.")
             # Register global application commands so they appear in / suggestions
-            synced = await bot.tree.sync()
-            print(f"🔁 Synced {len(synced)} application commands globally.")
-        except Exception as e:
-            print(f"❌ Failed to sync application commands: {e}")
-        _synced = True
-    print("Bot is ready!")
+            synced = await sync_if_changed(bot, store=store, force=force)
+            if synced is None:
+                log.info("⏭️ Application commands unchanged; global sync skipped.")
+            else:
+                log.info(f"🔁 Synced {len(synced)} application commands globally.")
+        except Exception:
+            log.exception("❌ Failed to sync application commands")
+        startup.mark("command_sync")
+    if not _synced:
+        startup.finish()
+        log.info(f"⏱️ Time to ready: {startup.report()}")
+    _synced = True
+    log.info("Bot is ready!")
 
-async def load_cogs_from_folder(folder: str = "commands"):
-    """
-    Dynamically import modules from the commands folder and:
-      - if module has async setup(bot) -> call it
-      - else find a Cog subclass in module and add it
-    """
-    for filename in os.listdir(folder):
-        if not filename.endswith(".py") or filename.startswith("_"):
-            continue
-        module_name = filename[:-3]
-        full_module = f"{folder}.{module_name}"
+# Per-user/guild token buckets and a global in-flight cap, checked once per invocation
+admission = get_admission(bot)
+
+@bot.check_once
+async def admit_command(ctx):
+    return admission.admit(ctx)
+
+@bot.event
+async def on_command_error(ctx, error):
+    # After-invoke hooks don't run for failed slash invocations, so release here too
+    admission.release(ctx)
+    _finish_command(ctx, "error")
+    finish_trace(getattr(ctx, "cpg_trace", None), "error", error=type(error).__name__)
+    if isinstance(error, CommandThrottled):
+        # Answered straight away (before any defer) so Discord never shows a timeout
         try:
-            module = importlib.import_module(full_module)
-            # If module provides an async setup(bot) function, call it
-            setup_func = getattr(module, "setup", None)
-            if setup_func and inspect.iscoroutinefunction(setup_func):
-                print(f"→ calling setup() in {full_module}")
-                await setup_func(bot)
-                continue
+            await ctx.send(error.user_message(), ephemeral=True)
+        except discord.HTTPException:
+            pass
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    # Cogs mark defer/fetch/parse/send phases on this same timer; each mark is
+    # also a span on the invocation's trace, alongside its upstream requests
+    timer = command_timer(ctx)
+    ctx.cpg_trace = start_trace(timer.command)
+
+def _finish_command(ctx, status: str):
+    # Once per invocation, and only for commands that got past before_invoke
+    timer = getattr(ctx, "cpg_timer", None)
+    if timer is None or getattr(ctx, "cpg_finished", False):
+        return
+    ctx.cpg_finished = True
+    metrics.observe("command_seconds", timer.elapsed(), command=timer.command)
+    metrics.inc("commands_total", command=timer.command, status=status)
+
+@bot.after_invoke
+async def record_command_latency(ctx):
+    admission.release(ctx)
+    status = "error" if ctx.command_failed else "ok"
+    _finish_command(ctx, status)
+    finish_trace(getattr(ctx, "cpg_trace", None), status,
+                 guild=ctx.guild.id if ctx.guild else None, slash=ctx.interaction is not None)
+
+def collect_bot_stats(registry):
+    """Copy pool/cache/gateway stats into gauges; called periodically on the event loop."""
+    if not math.isinf(bot.latency) and not math.isnan(bot.latency):
+        registry.set("gateway_latency_seconds", bot.latency)
+    http_client = getattr(bot, "http_client", None)
+    if http_client is not None:
+        http_stats = http_client.stats()
+        registry.set("http_pool_connections", http_stats["in_use"], state="in_use")
+        registry.set("http_pool_connections", http_stats["idle"], state="idle")
+        registry.set("http_requests_coalesced", http_stats["coalesced"])
+        registry.set("http_requests_retried", http_stats["retries"])
+    for name in ("response_cache", "track_info_cache"):
+        cache = getattr(bot, name, None)
+        if cache is None:
+            continue
+        cache_stats = cache.stats()
+        registry.set("cache_entries", cache_stats["entries"], cache=name)
+        registry.set("cache_hit_rate", cache_stats["hit_rate"], cache=name)
+        for result in ("hits", "stale_hits", "misses"):
+            registry.set("cache_lookups", cache_stats[result], cache=name, result=result)
+    for name, pool in getattr(bot, "candidate_pools", {}).items():
+        pool_stats = pool.stats()
+        registry.set("candidate_pool_items", sum(k["items"] for k in pool_stats["keys"].values()), pool=name)
+        registry.set("candidate_pool_draws", pool_stats["served"], pool=name, result="served")
+        registry.set("candidate_pool_draws", pool_stats["empty"], pool=name, result="empty")
+    vibe_index = getattr(bot, "vibe_index", None)
+    if vibe_index is not None:
+        registry.set("vibe_index_items", vibe_index.size)
+    admission_stats = admission.stats()
+    registry.set("admission_inflight", admission_stats["inflight"])
+    registry.set("admission_buckets", admission_stats["buckets"])
+    registry.set("log_records_dropped", dropped_log_records())
+    media_resolver = getattr(bot, "media_resolver", None)
+    if media_resolver is not None:
+        media_stats = media_resolver.stats()
+        registry.set("media_cache_entries", media_stats["entries"])
+        registry.set("media_checks_pending", media_stats["pending"])
+    history = getattr(bot, "recent_history", None)
+    if history is not None:
+        history_stats = history.stats()
+        registry.set("history_scopes", history_stats["scopes"])
+        registry.set("history_bytes", history_stats["bytes"])
+        registry.set("history_picks", history_stats["fresh"], result="fresh")
+        registry.set("history_picks", history_stats["repeats"], result="repeat")
+
+def _compile_module(full_module: str):
+    # Locate and compile the module (or read its cached bytecode) without executing it
+    spec = importlib.util.find_spec(full_module)
+    if spec is not None and hasattr(spec.loader, "get_code"):
+        spec.loader.get_code(full_module)
+    return spec
 
+async def _load_cog_module(full_module: str) -> dict:
+    """Compile one command module off the loop, then load it; returns its timings."""
+    # "compile" runs in a worker thread; "load" (executing the module and its setup) runs on the loop
+    timing = {"module": full_module, "compile": 0.0, "load": 0.0, "ok": False}
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(_compile_module, full_module)
+        timing["compile"] = time.perf_counter() - started
+        started = time.perf_counter()
+        try:
+            # Modules with an async setup(bot) load as extensions, so they can be reloaded in place
+            await bot.load_extension(full_module)
+            timing["ok"] = True
+        except commands.NoEntryPointError:
             # Otherwise, attempt to locate a Cog subclass in the module
+            module = importlib.import_module(full_module)
             cog_class = None
             for _, obj in inspect.getmembers(module, inspect.isclass):
                 if issubclass(obj, commands.Cog) and obj is not commands.Cog:
@@ -75,21 +234,152 @@ async def load_cogs_from_folder(folder: str = "commands"):
                     break
 
             if cog_class:
-                print(f"→ loading Cog {cog_class.__name__} from {full_module}")
                 await bot.add_cog(cog_class(bot))
+                timing["ok"] = True
             else:
-                print(f"⚠️ No Cog or async setup() found in {full_module}; skipping.")
-        except Exception as e:
-            print(f"❌ Failed to load {full_module}: {e}")
+                log.warning(f"⚠️ No Cog or async setup() found in {full_module}; skipping.")
+        timing["load"] = time.perf_counter() - started
+    except Exception:
+        log.exception(f"❌ Failed to load {full_module}")
+    return timing
+
+async def load_cogs_from_folder(folder: str = "commands"):
+    """
+    Dynamically import modules from the commands folder and:
+      - if module has async setup(bot) -> call it
+      - else find a Cog subclass in module and add it
+    Modules are compiled in worker threads and set up concurrently.
+    """
+    modules = [f"{folder}.{filename[:-3]}" for filename in sorted(os.listdir(folder))
+               if filename.endswith(".py") and not filename.startswith("_")]
+    timings = await asyncio.gather(*(_load_cog_module(m) for m in modules))
+    for timing in timings:
+        if timing["ok"]:
+            log.info(f"→ loaded {timing['module']} (compile {timing['compile'] * 1000:.0f}ms, "
+                     f"load {timing['load'] * 1000:.0f}ms)")
+        metrics.set("cog_load_seconds", timing["compile"], module=timing["module"], phase="compile")
+        metrics.set("cog_load_seconds", timing["load"], module=timing["module"], phase="load")
+    return timings
 
 async def setup_hook():
     # discord.py will call this before login completes
+    startup.mark("login")
+    # Shared pooled HTTP client; cogs use bot.http_client instead of opening their own sessions
+    # Responses are cached per upstream source so popular lists are not refetched per command
+    bot.response_cache = ResponseCache(max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "512")))
+    # Outbound requests share per-host token buckets so bursts don't trip upstream 429s
+    store_path = os.getenv("SHARED_STORE_PATH")
+    if store_path:
+        # Worker processes share cached responses and rate-limit budgets through one SQLite file
+        bot.shared_store = await asyncio.to_thread(SharedStore, store_path)
+        bot.rate_limiter = SharedRateLimiter(bot.shared_store)
+    else:
+        bot.shared_store = None
+        bot.rate_limiter = RateLimiter()
+    bot.http_client = HttpClient(cache=bot.response_cache, limiter=bot.rate_limiter,
+                                 shared_store=bot.shared_store)
+    # Event-loop lag + periodic gauge collection for the /metrics endpoint
+    metrics.add_collector(collect_bot_stats)
+    bot.loop_watcher = asyncio.create_task(watch_event_loop())
+    # Health/metrics server runs on this same loop (no extra thread)
+    bot.started_at = time.monotonic()
+    try:
+        bot.web_runner = await start_keep_alive(bot)
+    except OSError as e:
+        # A port clash shouldn't keep the bot off the gateway; it just runs without the endpoints
+        log.error(f"❌ Health/metrics server failed to start: {e}")
+        bot.web_runner = None
+    # Close gracefully (gateway, web server, HTTP pool) when a supervisor or host sends SIGTERM.
+    # Same path as Ctrl-C: cancelling the main task makes bot.run's `async with bot` await the
+    # whole close(), where a detached close task would be cancelled once the gateway is down.
+    main_task = asyncio.current_task()
+
+    def on_sigterm():
+        if bot.cpg_close_task is None:
+            main_task.cancel()
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, on_sigterm)
+    except (NotImplementedError, RuntimeError):
+        pass  # Windows event loops don't support signal handlers
+    await bot.http_client.start()
+    startup.mark("services")
     await load_cogs_from_folder("commands")
+    startup.mark("cogs")
+    # Warm pools/caches from the last run's snapshot without holding up login
+    snapshot_path = os.getenv("SNAPSHOT_PATH", "cpg_snapshot.sqlite3")
+    bot.snapshotter = None
+    if snapshot_path:
+        try:
+            store = await asyncio.to_thread(SnapshotStore, snapshot_path)
+        except Exception as e:
+            log.warning(f"⚠️ Snapshot store disabled ({snapshot_path}): {e}")
+        else:
+            bot.snapshotter = Snapshotter(bot, store, interval=float(os.getenv("SNAPSHOT_INTERVAL", "60")))
+            bot.snapshot_load = asyncio.create_task(bot.snapshotter.load())
+    startup.mark("snapshot")
+    # HEAD-check embed images of indexed candidates in the background (MEDIA_CHECK=0 disables)
+    if os.getenv("MEDIA_CHECK", "1") != "0":
+        get_media_resolver(bot).start()
+    # HOT_RELOAD=1: reload edited command modules in place instead of restarting the process
+    bot.extension_watcher = None
+    if os.getenv("HOT_RELOAD") == "1":
+        guild_id = os.getenv("DISCORD_GUILD_ID")
+        bot.extension_watcher = ExtensionWatcher(
+            bot, "commands",
+            interval=float(os.getenv("HOT_RELOAD_INTERVAL", "2")),
+            sync=WORKER_ID == 0,
+            guild=discord.Object(id=int(guild_id)) if guild_id else None,
+            store=bot.snapshotter.store if bot.snapshotter else None,
+        )
+        await bot.extension_watcher.start()
+        log.info("♻️ Hot reload enabled for commands/")
+
+_bot_close = bot.close
+bot.cpg_close_task = None
+
+async def _shutdown():
+    # Shut down the shared HTTP pool along with the gateway connection
+    loop_watcher = getattr(bot, "loop_watcher", None)
+    if loop_watcher is not None:
+        loop_watcher.cancel()
+    extension_watcher = getattr(bot, "extension_watcher", None)
+    if extension_watcher is not None:
+        extension_watcher.stop()
+    media_resolver = getattr(bot, "media_resolver", None)
+    if media_resolver is not None:
+        media_resolver.stop()
+    await _bot_close()
+    snapshotter = getattr(bot, "snapshotter", None)
+    if snapshotter is not None:
+        # Persist whatever changed since the last periodic write
+        await snapshotter.stop()
+    web_runner = getattr(bot, "web_runner", None)
+    if web_runner is not None:
+        await stop_keep_alive(web_runner)
+        bot.web_runner = None
+    http_client = getattr(bot, "http_client", None)
+    if http_client is not None:
+        await http_client.close()
+        bot.http_client = None
+
+async def close():
+    # Runs the teardown once; a second call (e.g. Ctrl-C under supervisor.py delivers both
+    # SIGINT and SIGTERM) waits for the first instead of cleaning up the same resources again
+    if bot.cpg_close_task is None:
+        bot.cpg_close_task = asyncio.create_task(_shutdown())
+    await asyncio.shield(bot.cpg_close_task)
 
 # For discord.py >=2.0 we attach setup_hook to the bot
 # If you prefer, you can use bot.setup_hook = setup_hook
 bot.setup_hook = setup_hook
+bot.close = close
 
 if __name__ == "__main__":
-    keep_alive()  # start the small web server for uptime pings
-    bot.run(TOKEN)
+    # The uptime/health web server is started from setup_hook on the bot's loop
+    startup.mark("imports")
+    # log_handler=None: discord.py's own logs go through the queue set up above
+    try:
+        bot.run(TOKEN, log_handler=None)
+    except asyncio.CancelledError:
+        pass  # SIGTERM: the main task was cancelled and close() has finished
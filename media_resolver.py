@@ -0,0 +1,177 @@
+# media_resolver.py
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+from discord.ext import tasks
+
+from candidate_pool import add_pool_listener, remove_pool_listener
+from metrics import metrics
+
+# Statuses that say the image itself is missing; anything else (429, 5xx, timeouts) is retried later
+BROKEN_STATUSES = {400, 403, 404, 410}
+
+
+class MediaResolver:
+    """
+    Background checker for the images commands put in embeds.
+
+    Cogs register, per candidate pool, a function returning an item's image
+    URL variants best first (e.g. TMDB w780 before w500). Newly indexed
+    candidates are queued and HEAD-checked a few at a time off the command
+    path; the first variant that answers with an image is remembered, and an
+    item with none is remembered as broken. Results live in a bounded LRU
+    with a TTL, so commands only ever read memory: image_url() returns the
+    verified variant, and prefer() lets RecentHistory favour candidates with
+    verified artwork.
+    """
+
+    def __init__(self, bot, max_entries: int = 50000, ttl: float = 24 * 3600, concurrency: int = 4,
+                 batch: int = 20, interval: float = 1.0, max_pending: int = 10000):
+        self.bot = bot
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.batch = batch
+        self.max_pending = max_pending
+        self.variants = {}
+        # (pool name, item id) -> (verified url or "" when broken, checked at)
+        self._results = OrderedDict()
+        self._pending = deque()
+        self._queued = set()
+        self._loop = tasks.loop(seconds=interval)(self._drain)
+        self.checks = 0
+        self.verified_items = 0
+        self.broken_items = 0
+
+    def register(self, pool_name: str, variants):
+        """`variants(item)` returns the image URLs to try for an item, best first."""
+        self.variants[pool_name] = variants
+
+    @property
+    def running(self) -> bool:
+        return self._loop.is_running()
+
+    def start(self):
+        add_pool_listener(self.bot, self.on_candidates)
+        self._loop.start()
+
+    def stop(self):
+        remove_pool_listener(self.bot, self.on_candidates)
+        self._loop.cancel()
+
+    def on_candidates(self, pool, key, items):
+        for item in items:
+            self.enqueue(pool, item)
+
+    def enqueue(self, pool, item):
+        # Nothing drains the queue unless start() was called (MEDIA_CHECK=0)
+        if not self.running or pool.name not in self.variants or len(self._pending) >= self.max_pending:
+            return
+        entry = (pool.name, pool.id_of(item))
+        if entry[1] is None or entry in self._queued:
+            return
+        self._queued.add(entry)
+        self._pending.append((entry, item))
+
+    def _lookup(self, entry):
+        result = self._results.get(entry)
+        if result is None:
+            return None
+        url, checked_at = result
+        if time.time() - checked_at > self.ttl:
+            del self._results[entry]
+            return None
+        return url
+
+    def verified(self, pool, item) -> bool:
+        return bool(self._lookup((pool.name, pool.id_of(item))))
+
+    def prefer(self, pool):
+        """Predicate for RecentHistory.pick, or None while the resolver isn't checking this pool."""
+        if not self.running or pool.name not in self.variants:
+            return None
+        return lambda item: self.verified(pool, item)
+
+    def image_url(self, pool, item, fallback: str = None):
+        """
+        The verified image URL for `item`; None when every variant is broken;
+        `fallback` (unchecked) while the item hasn't been checked yet.
+        """
+        url = self._lookup((pool.name, pool.id_of(item)))
+        if url is None:
+            self.enqueue(pool, item)
+            return fallback
+        return url or None
+
+    async def _check(self, entry, item):
+        pool_name = entry[0]
+        broken = True
+        try:
+            urls = self.variants[pool_name](item)
+        except Exception:
+            urls = []
+        for url in urls:
+            self.checks += 1
+            status, content_type = await self.bot.http_client.head(url)
+            if status == 200 and (not content_type or content_type.startswith("image/")):
+                self._remember(entry, url)
+                self.verified_items += 1
+                metrics.inc("media_checks_total", pool=pool_name, result="verified")
+                return
+            if status != 200 and status not in BROKEN_STATUSES:
+                # Rate limited, upstream error or unreachable: try again when the item is next seen
+                broken = False
+        if broken:
+            self._remember(entry, "")
+            self.broken_items += 1
+            metrics.inc("media_checks_total", pool=pool_name, result="broken")
+        else:
+            metrics.inc("media_checks_total", pool=pool_name, result="error")
+
+    def _remember(self, entry, url: str):
+        self._results[entry] = (url, time.time())
+        self._results.move_to_end(entry)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def _drain(self):
+        if not self._pending:
+            return
+        batch = []
+        while self._pending and len(batch) < self.batch:
+            entry, item = self._pending.popleft()
+            self._queued.discard(entry)
+            if self._lookup(entry) is None:
+                batch.append((entry, item))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(entry, item):
+            async with semaphore:
+                await self._check(entry, item)
+
+        await asyncio.gather(*(check(entry, item) for entry, item in batch), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._results),
+            "max_entries": self.max_entries,
+            "pending": len(self._pending),
+            "checks": self.checks,
+            "verified": self.verified_items,
+            "broken": self.broken_items,
+        }
+
+
+def get_media_resolver(bot) -> MediaResolver:
+    """Return the bot-wide MediaResolver, creating it on first use."""
+    resolver = getattr(bot, "media_resolver", None)
+    if resolver is None:
+        resolver = bot.media_resolver = MediaResolver(
+            bot,
+            max_entries=int(os.getenv("MEDIA_CACHE_SIZE", "50000")),
+            ttl=float(os.getenv("MEDIA_CACHE_TTL", str(24 * 3600))),
+            concurrency=int(os.getenv("MEDIA_CHECK_CONCURRENCY", "4")),
+        )
+    return resolver
@@ -0,0 +1,264 @@
+# metrics.py
+import asyncio
+import threading
+import time
+
+from logs import span
+
+# Latency buckets (seconds): fine-grained below 100ms where cache hits live,
+# coarse above it where upstream round trips and Discord sends land.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(label_key: tuple, extra: tuple = ()) -> str:
+    pairs = label_key + extra
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative on export, like Prometheus)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the matching bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= rank:
+                inside = (rank - seen) / self.counts[i] if self.counts[i] else 0.0
+                return lower + (bound - lower) * inside
+            seen += self.counts[i]
+            lower = bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Process-wide registry of counters, gauges and histograms.
+
+    Normally written and read on the event loop (keep_alive.py serves it in
+    the same loop), but every access goes through one lock so threads such
+    as the benchmark harness can read it too. Gauges are refreshed by
+    collector callbacks that run on the event loop (see watch_event_loop).
+    """
+
+    def __init__(self, prefix: str = "cpg"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def get(self, name: str, **labels):
+        """Current value of a counter or gauge series, or None if it was never set."""
+        key = _label_key(labels)
+        with self._lock:
+            for family in (self._gauges, self._counters):
+                if name in family and key in family[name]:
+                    return family[name][key]
+        return None
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def add_collector(self, func):
+        """Register `func(metrics)` to refresh gauges periodically on the event loop."""
+        self._collectors.append(func)
+
+    def collect(self):
+        for func in list(self._collectors):
+            try:
+                func(self)
+            except Exception:
+                # A broken collector must not take the loop watcher down
+                self.inc("collector_errors_total")
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for kind, family in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(family):
+                    full = f"{self.prefix}_{name}"
+                    if name in self._help:
+                        lines.append(f"# HELP {full} {self._help[name]}")
+                    lines.append(f"# TYPE {full} {kind}")
+                    for key, value in sorted(family[name].items()):
+                        lines.append(f"{full}{_format_labels(key)} {value}")
+            for name in sorted(self._histograms):
+                full = f"{self.prefix}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, hist in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{_format_labels(key, (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{full}_bucket{_format_labels(key, (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {hist.sum}")
+                    lines.append(f"{full}_count{_format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Compact JSON-friendly view: counters, gauges and p50/p99 per histogram series."""
+        def series_name(key):
+            return ",".join(f"{k}={v}" for k, v in key) or "all"
+
+        with self._lock:
+            return {
+                "counters": {name: {series_name(k): v for k, v in s.items()}
+                             for name, s in self._counters.items()},
+                "gauges": {name: {series_name(k): v for k, v in s.items()}
+                           for name, s in self._gauges.items()},
+                "histograms": {
+                    name: {
+                        series_name(k): {
+                            "count": h.count,
+                            "avg_ms": round(1000 * h.sum / h.count, 2) if h.count else 0.0,
+                            "p50_ms": round(1000 * h.quantile(0.5), 2),
+                            "p99_ms": round(1000 * h.quantile(0.99), 2),
+                        }
+                        for k, h in s.items()
+                    }
+                    for name, s in self._histograms.items()
+                },
+            }
+
+
+# Shared registry used by the bot, the HTTP client and the keep-alive server
+metrics = Metrics()
+metrics.describe("command_seconds", "End-to-end command latency")
+metrics.describe("command_phase_seconds", "Command latency split into defer/fetch/parse/send")
+metrics.describe("upstream_request_seconds", "Upstream HTTP request latency")
+metrics.describe("upstream_responses_total", "Upstream HTTP responses by status")
+metrics.describe("event_loop_lag_seconds", "Delay between a scheduled wake-up and when the loop ran it")
+metrics.describe("startup_phase_seconds", "Time spent in each startup phase")
+metrics.describe("startup_seconds", "Process start to first on_ready")
+metrics.describe("cog_load_seconds", "Per command module: compile (worker thread) and load (module execution + setup, on the loop)")
+metrics.describe("autocomplete_seconds", "Time to answer an autocomplete request from a prefix index")
+metrics.describe("admission_total", "Command admission decisions (admitted/degraded/user/guild/busy)")
+metrics.describe("media_checks_total", "Background image checks by pool and result")
+metrics.describe("log_records_dropped", "Log records dropped because the log queue was full")
+
+
+class CommandTimer:
+    """
+    Splits one command invocation into phases.
+    Call mark(phase) after each step; the time since the previous mark is recorded.
+    """
+
+    def __init__(self, command: str, registry: Metrics = metrics):
+        self.command = command
+        self.registry = registry
+        self.started = time.perf_counter()
+        self._last = self.started
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.registry.observe("command_phase_seconds", now - self._last, command=self.command, phase=phase)
+        # Same phase on the invocation's trace, next to its upstream requests
+        span(phase, now - self._last)
+        self._last = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class StartupTimeline:
+    """
+    Time-to-ready breakdown for one process start.
+    Like CommandTimer, mark(phase) records the time since the previous mark.
+    """
+
+    def __init__(self, started: float = None, registry: Metrics = metrics):
+        self.registry = registry
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.phases = {}
+
+    def mark(self, phase: str) -> float:
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last)
+        self.registry.set("startup_phase_seconds", self.phases[phase], phase=phase)
+        self._last = now
+        return self.phases[phase]
+
+    def finish(self) -> float:
+        """Record total time to ready and return it."""
+        total = time.perf_counter() - self.started
+        self.registry.set("startup_seconds", total)
+        return total
+
+    def report(self) -> str:
+        parts = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phases.items())
+        return f"{time.perf_counter() - self.started:.2f}s ({parts})"
+
+
+def command_timer(ctx) -> CommandTimer:
+    """Return the CommandTimer for this invocation, creating it on first use."""
+    timer = getattr(ctx, "cpg_timer", None)
+    if timer is None:
+        name = ctx.command.qualified_name if getattr(ctx, "command", None) else "unknown"
+        timer = ctx.cpg_timer = CommandTimer(name)
+    return timer
+
+
+async def watch_event_loop(interval: float = 1.0, registry: Metrics = metrics):
+    """Measure event-loop lag and run gauge collectors; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        registry.observe("event_loop_lag_seconds", lag)
+        registry.set("event_loop_lag_last_seconds", lag)
+        registry.collect()
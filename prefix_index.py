@@ -0,0 +1,92 @@
+# prefix_index.py
+import time
+from bisect import bisect_left
+
+from discord import app_commands
+
+from metrics import metrics
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index for app-command autocomplete.
+
+    Every term is findable by the start of any of its words ("fic" finds
+    "science fiction"). Lookups are a bisect plus a short scan, so an
+    autocomplete answer never waits on the network; update() rebuilds the
+    arrays and is meant to run from background refreshes.
+    """
+
+    def __init__(self, name: str, max_scan: int = 200):
+        self.name = name
+        self.max_scan = max_scan
+        self.weights = {}
+        self._keys = []
+        self._terms = []
+        self._top = []
+        self.lookups = 0
+
+    def update(self, terms: dict, replace: bool = False):
+        """Merge term -> weight (higher ranks first); replace=True drops terms not given."""
+        weights = {} if replace else dict(self.weights)
+        for term, weight in terms.items():
+            term = term.strip().lower()
+            if term:
+                weights[term] = max(weight, weights.get(term, weight))
+        entries = sorted((word_start, term) for term in weights for word_start in self._word_starts(term))
+        self.weights = weights
+        self._keys = [key for key, _ in entries]
+        self._terms = [term for _, term in entries]
+        self._top = sorted(weights, key=lambda t: (-weights[t], t))[:100]
+
+    @staticmethod
+    def _word_starts(term: str) -> list:
+        starts = [term]
+        for i, ch in enumerate(term):
+            if ch in " -" and i + 1 < len(term):
+                starts.append(term[i + 1:])
+        return starts
+
+    def complete(self, prefix: str, limit: int = 25) -> list:
+        """Terms with a word starting with `prefix`, best first; the most popular when empty."""
+        self.lookups += 1
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return self._top[:limit]
+        matches = {}
+        i = bisect_left(self._keys, prefix)
+        end = min(len(self._keys), i + self.max_scan)
+        while i < end and self._keys[i].startswith(prefix):
+            term = self._terms[i]
+            # Whole-term prefix matches beat matches on a later word
+            matches[term] = max(matches.get(term, 0), 2 if term.startswith(prefix) else 1)
+            i += 1
+        return sorted(matches, key=lambda t: (-matches[t], -self.weights[t], t))[:limit]
+
+    def choices(self, current: str, limit: int = 25, separator: str = None) -> list:
+        """
+        app_commands.Choice list for `current`. With a `separator`, only the last
+        comma-separated part is completed and the earlier parts are kept.
+        """
+        started = time.perf_counter()
+        head, part = "", current
+        if separator and separator in current:
+            head, part = current.rsplit(separator, 1)
+            head = head + separator + " "
+        choices = [app_commands.Choice(name=(head + term)[:100], value=(head + term)[:100])
+                   for term in self.complete(part, limit)]
+        metrics.observe("autocomplete_seconds", time.perf_counter() - started, index=self.name)
+        return choices
+
+    def __len__(self):
+        return len(self.weights)
+
+
+def get_prefix_index(bot, name: str) -> PrefixIndex:
+    """Return the bot-wide PrefixIndex called `name`, creating it on first use."""
+    indexes = getattr(bot, "prefix_indexes", None)
+    if indexes is None:
+        indexes = bot.prefix_indexes = {}
+    if name not in indexes:
+        indexes[name] = PrefixIndex(name)
+    return indexes[name]
@@ -0,0 +1,155 @@
+# rate_limit.py
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+
+# Requests per second and burst size per upstream host, kept a little under
+# each API's published limits.
+DEFAULT_LIMITS = {
+    "api.themoviedb.org": (20.0, 20),
+    "ws.audioscrobbler.com": (4.0, 5),
+    "openlibrary.org": (2.0, 5),
+    "api.artic.edu": (1.0, 10),
+}
+DEFAULT_LIMIT = (5.0, 5)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` if available right now; never waits."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return False
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` would be available."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, (tokens - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+        return max(wait, self.paused_until - now)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` can be taken."""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (e.g. after a 429 Retry-After)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class RateLimiter:
+    """Per-host token buckets shared by every outbound request."""
+
+    def __init__(self, limits: dict = None):
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self._buckets = {}
+        self.waits = 0
+        self.backoffs = 0
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, capacity = self.limits.get(host, DEFAULT_LIMIT)
+            bucket = self._buckets[host] = TokenBucket(rate, capacity)
+        return bucket
+
+    async def acquire(self, host: str):
+        bucket = self.bucket(host)
+        if not bucket.try_acquire():
+            self.waits += 1
+            await bucket.acquire()
+
+    async def backoff(self, host: str, seconds: float):
+        self.backoffs += 1
+        self.bucket(host).pause(seconds)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "waits": self.waits,
+            "backoffs": self.backoffs,
+            "hosts": {
+                host: {
+                    "tokens": round(b.tokens, 2),
+                    "rate": b.rate,
+                    "paused_for": round(max(0.0, b.paused_until - now), 2),
+                }
+                for host, b in self._buckets.items()
+            },
+        }
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter whose buckets live in a SharedStore, so several worker
+    processes on one host draw from a single budget per upstream.
+    """
+
+    def __init__(self, store, limits: dict = None):
+        super().__init__(limits)
+        self.store = store
+
+    async def acquire(self, host: str):
+        rate, capacity = self.limits.get(host, DEFAULT_LIMIT)
+        waited = False
+        while True:
+            wait = await asyncio.to_thread(self.store.take_token, host, rate, capacity)
+            if wait <= 0:
+                return
+            if not waited:
+                self.waits += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    async def backoff(self, host: str, seconds: float):
+        self.backoffs += 1
+        # Awaited, so a retry's acquire() can't take a token before the pause is stored;
+        # other workers see it on their next acquire
+        await asyncio.to_thread(self.store.pause_host, host, seconds)
+
+    def stats(self) -> dict:
+        # acquire() only draws from the shared buckets, so report those (not the unused local ones)
+        return {
+            "waits": self.waits,
+            "backoffs": self.backoffs,
+            "hosts": {
+                host: dict(state, rate=self.limits.get(host, DEFAULT_LIMIT)[0])
+                for host, state in self.store.bucket_stats().items()
+            },
+        }
+
+
+def parse_retry_after(value: str, default: float = 1.0) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,123 @@
+# recent_history.py
+import os
+from array import array
+from collections import OrderedDict
+
+
+class RingBuffer:
+    """Fixed-size ring of 64-bit item hashes; a full ring overwrites its oldest slot."""
+
+    __slots__ = ("slots", "pos")
+
+    def __init__(self, size: int):
+        self.slots = array("Q", bytes(8 * size))
+        self.pos = 0
+
+    def __contains__(self, item_hash: int) -> bool:
+        return item_hash in self.slots
+
+    def add(self, item_hash: int):
+        self.slots[self.pos] = item_hash
+        self.pos = (self.pos + 1) % len(self.slots)
+
+
+def history_scopes(ctx) -> list:
+    """Scopes an invocation's picks are remembered in: its channel and, in a server, its guild."""
+    scopes = []
+    channel = getattr(ctx, "channel", None)
+    if channel is not None:
+        scopes.append(f"c{channel.id}")
+    guild = getattr(ctx, "guild", None)
+    if guild is not None:
+        scopes.append(f"g{guild.id}")
+    return scopes
+
+
+class RecentHistory:
+    """
+    "No repeats" memory per channel and per guild.
+
+    Each scope keeps the hashes of the last N items shown in a compact ring
+    buffer (8 bytes per slot), and only the `max_scopes` most recently active
+    scopes are kept, so memory stays flat no matter how many guilds use the bot.
+    """
+
+    def __init__(self, channel_size: int = 32, guild_size: int = 128, max_scopes: int = 20000,
+                 attempts: int = 8):
+        self.channel_size = channel_size
+        self.guild_size = guild_size
+        self.max_scopes = max_scopes
+        self.attempts = attempts
+        self._rings = OrderedDict()
+        self.fresh = 0
+        self.repeats = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _hash(namespace: str, item_id) -> int:
+        # 0 marks an empty slot, so never hand it out
+        return hash((namespace, item_id)) & 0xFFFFFFFFFFFFFFFF or 1
+
+    def _ring(self, scope: str) -> RingBuffer:
+        ring = self._rings.get(scope)
+        if ring is None:
+            ring = self._rings[scope] = RingBuffer(self.guild_size if scope[0] == "g" else self.channel_size)
+            while len(self._rings) > self.max_scopes:
+                self._rings.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._rings.move_to_end(scope)
+        return ring
+
+    def pick(self, pool, key: str, scopes=(), prefer=None):
+        """
+        Sample `pool` for `key`, skipping items recently shown in any of `scopes`,
+        and remember the pick. Falls back to a repeat when everything was seen.
+        With `prefer(item)`, unseen preferred items (e.g. verified artwork) are
+        tried first, then any unseen item.
+        """
+        if not scopes:
+            return pool.sample(key, attempts=self.attempts, prefer=prefer)
+        rings = [self._ring(scope) for scope in scopes]
+
+        def seen(item) -> bool:
+            item_hash = self._hash(pool.name, pool.id_of(item))
+            return any(item_hash in ring for ring in rings)
+
+        # One draw per command, so pool.served and the fresh/repeat stats count it once
+        item = pool.sample(key, exclude=seen, attempts=self.attempts, prefer=prefer)
+        if item is None:
+            return None
+        item_hash = self._hash(pool.name, pool.id_of(item))
+        if any(item_hash in ring for ring in rings):
+            self.repeats += 1
+        else:
+            self.fresh += 1
+        for ring in rings:
+            ring.add(item_hash)
+        return item
+
+    def stats(self) -> dict:
+        picks = self.fresh + self.repeats
+        return {
+            "scopes": len(self._rings),
+            "max_scopes": self.max_scopes,
+            "bytes": sum(ring.slots.itemsize * len(ring.slots) for ring in self._rings.values()),
+            "picks": picks,
+            "fresh": self.fresh,
+            "repeats": self.repeats,
+            "evictions": self.evictions,
+            "fresh_rate": round(self.fresh / picks, 4) if picks else 1.0,
+        }
+
+
+def get_history(bot) -> RecentHistory:
+    """Return the bot-wide RecentHistory, creating it on first use."""
+    history = getattr(bot, "recent_history", None)
+    if history is None:
+        history = bot.recent_history = RecentHistory(
+            channel_size=int(os.getenv("HISTORY_CHANNEL_SIZE", "32")),
+            guild_size=int(os.getenv("HISTORY_GUILD_SIZE", "128")),
+            max_scopes=int(os.getenv("HISTORY_MAX_SCOPES", "20000")),
+        )
+    return history
@@ -0,0 +1,148 @@
+# response_cache.py
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Fresh lifetime (seconds) per upstream source. The popular lists these APIs
+# return change over hours, so a command can almost always be served locally.
+DEFAULT_TTLS = {
+    "tmdb": 6 * 3600,
+    "lastfm": 3 * 3600,
+    "lastfm_info": 24 * 3600,
+    "openlibrary": 12 * 3600,
+    "aic": 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# Query parameters that must never end up in a cache key
+SECRET_PARAMS = {"api_key", "apikey", "key", "token"}
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of decoded upstream responses with per-source TTLs.
+
+    Entries are fresh until their TTL elapses, then stale for one more TTL.
+    A stale entry is still served but flagged so the caller can refresh it
+    in the background (stale-while-revalidate).
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+
+    def __init__(self, max_entries: int = 512, ttls: dict = None):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        # key -> (value, source, fresh_until, stale_until)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._per_source = {}
+        # Keys stored since the last take_dirty(), for incremental snapshots
+        self._dirty = set()
+
+    @staticmethod
+    def make_key(url: str, params: dict = None) -> str:
+        """Normalize endpoint + query params (sorted, secrets stripped) into a cache key."""
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            query.extend((str(k), str(v)) for k, v in params.items() if v is not None)
+        query = sorted((k, v) for k, v in query if k.lower() not in SECRET_PARAMS)
+        return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+    def ttl_for(self, source: str) -> float:
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def _count(self, source: str, field: str):
+        counters = self._per_source.setdefault(source, {"hits": 0, "stale_hits": 0, "misses": 0})
+        counters[field] += 1
+
+    def lookup(self, key: str, source: str = None):
+        """
+        Return (value, state) where state is FRESH, STALE or None on a miss.
+        Expired entries past their stale window are dropped.
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or now >= entry[3]:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            self._count(source or "unknown", "misses")
+            return None, None
+
+        value, entry_source, fresh_until, _ = entry
+        self._entries.move_to_end(key)
+        if now < fresh_until:
+            self.hits += 1
+            self._count(source or entry_source, "hits")
+            return value, self.FRESH
+        self.stale_hits += 1
+        self._count(source or entry_source, "stale_hits")
+        return value, self.STALE
+
+    def peek(self, key: str):
+        """Return a cached value (fresh or stale) without touching counters or LRU order."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[3]:
+            return None
+        return entry[0]
+
+    def store(self, key: str, value, source: str, fresh_for: float = None, stale_for: float = None,
+              dirty: bool = True):
+        """
+        Cache `value` under the source's TTL. `fresh_for`/`stale_for` override the
+        remaining lifetimes, e.g. for entries copied from a shared or on-disk store.
+        Pass dirty=False for entries restored from disk so they aren't written back.
+        """
+        ttl = self.ttl_for(source)
+        now = time.monotonic()
+        fresh_for = ttl if fresh_for is None else fresh_for
+        stale_for = fresh_for + ttl if stale_for is None else stale_for
+        self._entries[key] = (value, source, now + fresh_for, now + stale_for)
+        self._entries.move_to_end(key)
+        if dirty:
+            self._dirty.add(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def take_dirty(self) -> list:
+        """
+        Pop entries stored since the last call as (key, source, value, fresh_until,
+        stale_until) with wall-clock expiry times, skipping ones already evicted.
+        """
+        dirty, self._dirty = self._dirty, set()
+        offset = time.time() - time.monotonic()
+        rows = []
+        for key in dirty:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, source, fresh_until, stale_until = entry
+                rows.append((key, source, value, fresh_until + offset, stale_until + offset))
+        return rows
+
+    def clear(self):
+        self._entries.clear()
+        self._dirty.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "sources": {name: dict(c) for name, c in self._per_source.items()},
+        }
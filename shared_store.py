@@ -0,0 +1,113 @@
+# shared_store.py
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    value TEXT NOT NULL,
+    fresh_until REAL NOT NULL,
+    stale_until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    host TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    paused_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class SharedStore:
+    """
+    SQLite file shared by every worker process on one host.
+
+    Holds the upstream response cache and the per-host rate-limit buckets, so
+    N workers behave like one client towards TMDB/Last.fm/etc. Methods are
+    blocking; call them through asyncio.to_thread from the event loop.
+    Timestamps are wall-clock (time.time()) because monotonic clocks are not
+    comparable across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per-thread; to_thread may use any pool thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Response cache ------------------------------------------------------
+
+    def get_response(self, key: str):
+        """Return (value, fresh_until, stale_until) or None if missing/expired."""
+        row = self._conn().execute(
+            "SELECT value, fresh_until, stale_until FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def put_response(self, key: str, value, source: str, ttl: float):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO responses (key, source, value, fresh_until, stale_until) VALUES (?, ?, ?, ?, ?)",
+            (key, source, json.dumps(value, separators=(",", ":")), now + ttl, now + 2 * ttl))
+
+    def purge_expired(self) -> int:
+        cur = self._conn().execute("DELETE FROM responses WHERE stale_until <= ?", (time.time(),))
+        return cur.rowcount
+
+    # Rate-limit buckets --------------------------------------------------
+
+    def take_token(self, host: str, rate: float, capacity: int) -> float:
+        """
+        Atomically take one token from the shared bucket for `host`.
+        Returns 0.0 on success, otherwise the seconds to wait before retrying.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated, paused_until FROM buckets WHERE host = ?", (host,)).fetchone()
+            tokens, updated, paused_until = row if row else (float(capacity), now, 0.0)
+            if now < paused_until:
+                conn.execute("COMMIT")
+                return paused_until - now
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1.0:
+                tokens -= 1.0
+                wait = 0.0
+            else:
+                wait = (1.0 - tokens) / rate if rate > 0 else 1.0
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (host, tokens, updated, paused_until) VALUES (?, ?, ?, ?)",
+                (host, tokens, now, paused_until))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def pause_host(self, host: str, seconds: float):
+        until = time.time() + seconds
+        self._conn().execute(
+            "INSERT INTO buckets (host, tokens, updated, paused_until) VALUES (?, 0, ?, ?) "
+            "ON CONFLICT(host) DO UPDATE SET tokens = 0, paused_until = MAX(paused_until, excluded.paused_until)",
+            (host, time.time(), until))
+
+    def bucket_stats(self) -> dict:
+        now = time.time()
+        rows = self._conn().execute("SELECT host, tokens, paused_until FROM buckets").fetchall()
+        return {host: {"tokens": round(tokens, 2), "paused_for": round(max(0.0, paused - now), 2)}
+                for host, tokens, paused in rows}
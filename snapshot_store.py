@@ -0,0 +1,176 @@
+# snapshot_store.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from discord.ext import tasks
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    pool TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (pool, key)
+);
+CREATE TABLE IF NOT EXISTS cache_entries (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    value TEXT NOT NULL,
+    fresh_until REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Bot attributes holding ResponseCaches worth keeping across restarts
+SNAPSHOT_CACHES = ("response_cache", "track_info_cache")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class SnapshotStore:
+    """
+    On-disk copy of candidate pools and cached upstream/enrichment data.
+
+    Methods are blocking; call them through asyncio.to_thread. Expiry times
+    are wall-clock so they stay meaningful after a restart.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self):
+        """Drop expired rows and return (pool_rows, cache_rows) with decoded values."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM pools WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM cache_entries WHERE stale_until <= ?", (now,))
+        pools = [(pool, key, json.loads(state)) for pool, key, state in
+                 conn.execute("SELECT pool, key, state FROM pools")]
+        caches = [(cache, key, source, json.loads(value), fresh_until, stale_until)
+                  for cache, key, source, value, fresh_until, stale_until in
+                  conn.execute("SELECT cache, key, source, value, fresh_until, stale_until FROM cache_entries")]
+        return pools, caches
+
+    def write(self, pool_rows: list, cache_rows: list) -> int:
+        """Upsert changed pool indexes and cache entries in one transaction."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pools (pool, key, state, expires_at) VALUES (?, ?, ?, ?)",
+                [(pool, key, _dumps(state), expires_at) for pool, key, state, expires_at in pool_rows])
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (cache, key, source, value, fresh_until, stale_until) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(cache, key, source, _dumps(value), fresh_until, stale_until)
+                 for cache, key, source, value, fresh_until, stale_until in cache_rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(pool_rows) + len(cache_rows)
+
+    def get_meta(self, name: str):
+        row = self._conn().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str):
+        self._conn().execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+
+class Snapshotter:
+    """
+    Restores the bot's pools and caches from a SnapshotStore in the background
+    and writes back only what changed every `interval` seconds.
+    """
+
+    def __init__(self, bot, store: SnapshotStore, interval: float = 60.0):
+        self.bot = bot
+        self.store = store
+        self.loaded = 0
+        self.written = 0
+        self.failures = 0
+        self._loop = tasks.loop(seconds=interval)(self.flush)
+
+    async def load(self):
+        """Merge the snapshot into whatever pools/caches the cogs created, then start flushing."""
+        started = time.perf_counter()
+        try:
+            pool_rows, cache_rows = await asyncio.to_thread(self.store.load)
+        except Exception as e:
+            log.warning(f"⚠️ Could not read snapshot {self.store.path}: {e}")
+            pool_rows, cache_rows = [], []
+        pools = getattr(self.bot, "candidate_pools", {})
+        for name, key, state in pool_rows:
+            pool = pools.get(name)
+            if pool is not None:
+                pool.restore(key, state)
+                self.loaded += 1
+        now = time.time()
+        for name, key, source, value, fresh_until, stale_until in cache_rows:
+            cache = getattr(self.bot, name, None)
+            # A live entry fetched since startup is newer than the snapshot
+            if cache is None or cache.peek(key) is not None:
+                continue
+            cache.store(key, value, source, fresh_for=fresh_until - now, stale_for=stale_until - now, dirty=False)
+            self.loaded += 1
+        log.info(f"💾 Restored {self.loaded} snapshot entries in {time.perf_counter() - started:.2f}s")
+        if not self._loop.is_running():
+            self._loop.start()
+
+    def _collect(self):
+        now = time.time()
+        pool_rows = []
+        for name, pool in getattr(self.bot, "candidate_pools", {}).items():
+            for key in pool.take_dirty():
+                pool_rows.append((name, key, pool.snapshot(key), now + pool.refresh_after))
+        cache_rows = []
+        for name in SNAPSHOT_CACHES:
+            cache = getattr(self.bot, name, None)
+            if cache is not None:
+                cache_rows.extend((name,) + row for row in cache.take_dirty())
+        return pool_rows, cache_rows
+
+    async def flush(self):
+        """Write changes since the last flush; serialization and disk I/O run off the loop."""
+        pool_rows, cache_rows = self._collect()
+        if not pool_rows and not cache_rows:
+            return
+        try:
+            self.written += await asyncio.to_thread(self.store.write, pool_rows, cache_rows)
+        except Exception as e:
+            self.failures += 1
+            log.warning(f"⚠️ Snapshot write failed: {e}")
+
+    async def stop(self):
+        """Stop the periodic writer and flush once more."""
+        self._loop.cancel()
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {"path": self.store.path, "loaded": self.loaded, "written": self.written, "failures": self.failures}
@@ -0,0 +1,156 @@
+# supervisor.py
+"""
+Run the bot as several worker processes, each owning a slice of the shards.
+
+    python supervisor.py --workers 4            # shard count from Discord
+    python supervisor.py --workers 2 --shards 8
+
+Every worker runs main.py with SHARD_IDS/SHARD_COUNT/WORKER_ID set, its own
+health port (PORT + worker id) and a common SHARED_STORE_PATH so cached
+upstream responses and rate-limit budgets are shared across processes.
+Workers that exit are restarted with exponential backoff; SIGINT/SIGTERM
+stops them all gracefully.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+from logs import setup_logging
+
+log = logging.getLogger("supervisor")
+
+# A worker that stayed up this long is considered healthy again
+STABLE_AFTER = 60.0
+MAX_BACKOFF = 60.0
+
+
+def shard_ranges(shard_count: int, workers: int) -> list:
+    """Split shard ids 0..shard_count-1 into `workers` contiguous, near-equal slices."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+async def recommended_shards(token: str) -> int:
+    """Ask Discord (or DISCORD_API_BASE) how many shards this bot should run."""
+    base = os.getenv("DISCORD_API_BASE", "https://discord.com/api/v10")
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base}/gateway/bot", headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return int(data["shards"])
+
+
+class Worker:
+    def __init__(self, worker_id: int, shard_ids: list):
+        self.worker_id = worker_id
+        self.shard_ids = shard_ids
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+
+
+class Supervisor:
+    def __init__(self, command: list, shard_count: int, workers: int, store_path: str,
+                 base_port: int, stagger: float = 5.0):
+        self.command = command
+        self.shard_count = shard_count
+        self.store_path = store_path
+        self.base_port = base_port
+        self.stagger = stagger
+        self.workers = [Worker(i, ids) for i, ids in enumerate(shard_ranges(shard_count, workers))]
+        self._stopping = asyncio.Event()
+
+    def worker_env(self, worker: Worker) -> dict:
+        env = dict(os.environ)
+        env.update({
+            "WORKER_ID": str(worker.worker_id),
+            "SHARD_IDS": ",".join(map(str, worker.shard_ids)),
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARED_STORE_PATH": self.store_path,
+            "PORT": str(self.base_port + worker.worker_id),
+        })
+        return env
+
+    async def _spawn(self, worker: Worker):
+        worker.process = await asyncio.create_subprocess_exec(*self.command, env=self.worker_env(worker))
+        worker.started_at = time.monotonic()
+        log.info(f"🚀 worker {worker.worker_id} (pid {worker.process.pid}) shards {worker.shard_ids}")
+
+    async def _watch(self, worker: Worker):
+        # Stagger first starts so workers don't all IDENTIFY in the same window
+        await asyncio.sleep(worker.worker_id * self.stagger)
+        while not self._stopping.is_set():
+            await self._spawn(worker)
+            code = await worker.process.wait()
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - worker.started_at > STABLE_AFTER:
+                worker.restarts = 0
+            delay = min(MAX_BACKOFF, 2.0 ** worker.restarts)
+            worker.restarts += 1
+            log.warning(f"⚠️ worker {worker.worker_id} exited with {code}; restarting in {delay:.0f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, timeout: float = 15.0):
+        self._stopping.set()
+        running = [w.process for w in self.workers if w.process and w.process.returncode is None]
+        for process in running:
+            process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in running)), timeout=timeout)
+        except asyncio.TimeoutError:
+            for process in running:
+                if process.returncode is None:
+                    process.kill()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: asyncio.create_task(self.stop()))
+            except NotImplementedError:
+                pass
+        watchers = [asyncio.create_task(self._watch(w)) for w in self.workers]
+        await self._stopping.wait()
+        await asyncio.gather(*watchers, return_exceptions=True)
+
+
+async def main():
+    load_dotenv()
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Run the bot as supervised, sharded worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "2")))
+    parser.add_argument("--shards", type=int, default=None, help="total shard count (default: ask Discord)")
+    parser.add_argument("--store", default=os.getenv("SHARED_STORE_PATH", "cpg_shared.sqlite3"))
+    parser.add_argument("--base-port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--stagger", type=float, default=5.0, help="seconds between worker starts")
+    parser.add_argument("--cmd", nargs=argparse.REMAINDER, default=None,
+                        help="worker command (default: this Python running main.py)")
+    args = parser.parse_args()
+
+    shard_count = args.shards or await recommended_shards(os.getenv("DISCORD_TOKEN"))
+    command = args.cmd or [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")]
+    supervisor = Supervisor(command, shard_count, args.workers, os.path.abspath(args.store),
+                            args.base_port, stagger=args.stagger)
+    log.info(f"🧭 Supervising {len(supervisor.workers)} workers over {shard_count} shards")
+    await supervisor.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,2 @@
+# tools/__init__.py
+# Developer tooling (fake Discord gateway, etc.); not loaded by the bot.
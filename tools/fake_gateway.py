@@ -0,0 +1,223 @@
+# tools/fake_gateway.py
+"""
+Minimal local stand-in for Discord's REST API and gateway.
+
+Enough of the protocol for discord.py to log in, identify one or more shards
+and reach on_ready, so the sharded/supervised runtime can be exercised without
+a real token:
+
+    python -m tools.fake_gateway --port 8900 --shards 4
+    DISCORD_API_BASE=http://127.0.0.1:8900/api/v10 \\
+    DISCORD_GATEWAY_URL=ws://127.0.0.1:8900/gateway \\
+    DISCORD_TOKEN=fake python supervisor.py --workers 2
+
+GET /_fake/status lists which shards identified and how often.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from aiohttp import web, WSMsgType
+
+BOT_USER = {
+    "id": "100000000000000001",
+    "username": "cpg-fake",
+    "discriminator": "0000",
+    "avatar": None,
+    "bot": True,
+    "global_name": None,
+}
+APPLICATION = {
+    "id": "100000000000000002",
+    "name": "CPG (fake)",
+    "description": "",
+    "icon": None,
+    "bot_public": True,
+    "bot_require_code_grant": False,
+    "owner": BOT_USER,
+    "verify_key": "0" * 64,
+    "flags": 0,
+    "team": None,
+}
+
+
+def json_response(data, status: int = 200) -> web.Response:
+    # discord.py only decodes bodies whose Content-Type is exactly application/json
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={"Content-Type": "application/json"})
+
+
+# Gateway opcodes used below
+DISPATCH, HEARTBEAT, IDENTIFY, RESUME, HELLO, HEARTBEAT_ACK = 0, 1, 2, 6, 10, 11
+
+
+class FakeDiscord:
+    def __init__(self, shards: int = 1, heartbeat_interval: float = 41.25):
+        self.shards = shards
+        self.heartbeat_interval = heartbeat_interval
+        self.identifies = []
+        self.connected = {}
+        self.synced_commands = 0
+        self.upserted_commands = 0
+        # "global" or guild id -> {name: command}
+        self.commands = {}
+        self._ids = itertools.count(200000000000000000)
+
+    def base_url(self, request) -> str:
+        return f"{request.scheme}://{request.host}"
+
+    # REST ----------------------------------------------------------------
+
+    async def users_me(self, request):
+        return json_response(BOT_USER)
+
+    async def application_me(self, request):
+        return json_response(APPLICATION)
+
+    async def gateway(self, request):
+        ws_url = self.base_url(request).replace("http", "ws", 1) + "/gateway"
+        return json_response({
+            "url": ws_url,
+            "shards": self.shards,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1},
+        })
+
+    def _command(self, command: dict) -> dict:
+        command.setdefault("id", str(next(self._ids)))
+        command.setdefault("application_id", APPLICATION["id"])
+        command.setdefault("version", "1")
+        command.setdefault("description", "")
+        command.setdefault("type", 1)
+        return command
+
+    def _target(self, request) -> dict:
+        return self.commands.setdefault(request.match_info.get("guild_id", "global"), {})
+
+    async def put_commands(self, request):
+        commands = [self._command(c) for c in await request.json()]
+        self.synced_commands += 1
+        target = self._target(request)
+        target.clear()
+        target.update((c["name"], c) for c in commands)
+        return json_response(commands)
+
+    async def get_commands(self, request):
+        return json_response(list(self._target(request).values()))
+
+    async def post_command(self, request):
+        command = await request.json()
+        target = self._target(request)
+        existing = target.get(command["name"])
+        if existing:
+            command["id"] = existing["id"]
+        target[command["name"]] = self._command(command)
+        self.upserted_commands += 1
+        return json_response(command, status=200 if existing else 201)
+
+    async def delete_command(self, request):
+        target = self._target(request)
+        for name, command in list(target.items()):
+            if command["id"] == request.match_info["command_id"]:
+                del target[name]
+        return web.Response(status=204)
+
+    async def not_found(self, request):
+        return json_response({"message": "Unknown (fake gateway)", "code": 0}, status=404)
+
+    async def status(self, request):
+        return json_response({
+            "shards": self.shards,
+            "connected": sorted(self.connected),
+            "identifies": self.identifies,
+            "command_syncs": self.synced_commands,
+            "command_upserts": self.upserted_commands,
+            "commands": {target: sorted(cmds) for target, cmds in self.commands.items()},
+        })
+
+    # Gateway -------------------------------------------------------------
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({"op": HELLO, "d": {"heartbeat_interval": int(self.heartbeat_interval * 1000)}}))
+        shard = None
+        seq = 0
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    break
+                payload = json.loads(msg.data)
+                op = payload.get("op")
+                if op == HEARTBEAT:
+                    await ws.send_str(json.dumps({"op": HEARTBEAT_ACK}))
+                elif op == IDENTIFY:
+                    shard = payload["d"].get("shard") or [0, 1]
+                    self.identifies.append({"shard": shard, "at": time.time()})
+                    self.connected[shard[0]] = ws
+                    seq += 1
+                    await ws.send_str(json.dumps({
+                        "op": DISPATCH, "s": seq, "t": "READY",
+                        "d": {
+                            "v": 10,
+                            "user": BOT_USER,
+                            "guilds": [],
+                            "session_id": f"fake-session-{shard[0]}",
+                            "resume_gateway_url": self.base_url(request).replace("http", "ws", 1) + "/gateway",
+                            "shard": shard,
+                            "application": {"id": APPLICATION["id"], "flags": 0},
+                        },
+                    }))
+                elif op == RESUME:
+                    seq += 1
+                    await ws.send_str(json.dumps({"op": DISPATCH, "s": seq, "t": "RESUMED", "d": {}}))
+        finally:
+            if shard is not None and self.connected.get(shard[0]) is ws:
+                del self.connected[shard[0]]
+        return ws
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/v10/users/@me", self.users_me)
+        app.router.add_get("/api/v10/oauth2/applications/@me", self.application_me)
+        app.router.add_get("/api/v10/gateway/bot", self.gateway)
+        app.router.add_get("/api/v10/gateway", self.gateway)
+        for base in ("/api/v10/applications/{app_id}", "/api/v10/applications/{app_id}/guilds/{guild_id}"):
+            app.router.add_put(base + "/commands", self.put_commands)
+            app.router.add_get(base + "/commands", self.get_commands)
+            app.router.add_post(base + "/commands", self.post_command)
+            app.router.add_delete(base + "/commands/{command_id}", self.delete_command)
+        app.router.add_get("/gateway", self.websocket)
+        app.router.add_get("/_fake/status", self.status)
+        app.router.add_route("*", "/{tail:.*}", self.not_found)
+        return app
+
+
+async def serve(host: str, port: int, shards: int) -> web.AppRunner:
+    runner = web.AppRunner(FakeDiscord(shards=shards).app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Discord REST API + gateway for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--shards", type=int, default=1, help="shard count reported by /gateway/bot")
+    args = parser.parse_args()
+
+    async def run():
+        await serve(args.host, args.port, args.shards)
+        print(f"🧪 Fake Discord listening on http://{args.host}:{args.port} ({args.shards} shards)")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# vibe_index.py
+import re
+import zlib
+
+import numpy as np
+
+# Free-text moods are widened with related genres/tags before matching, so
+# "rainy sunday" still lands on calm music and slow films.
+MOOD_TERMS = {
+    "chill": ["relaxing", "calm", "ambient", "lofi", "acoustic", "chillout", "slow"],
+    "calm": ["chill", "ambient", "relaxing", "peaceful"],
+    "relaxing": ["chill", "ambient", "calm"],
+    "rainy": ["chill", "melancholy", "acoustic", "jazz", "drama"],
+    "cozy": ["chill", "family", "romance", "acoustic", "comedy"],
+    "nostalgic": ["retro", "80s", "90s", "classic", "oldies", "memories", "history"],
+    "retro": ["nostalgic", "80s", "70s", "classic", "oldies"],
+    "creative": ["art", "inspiration", "design", "experimental", "fantasy", "science fiction"],
+    "happy": ["comedy", "pop", "upbeat", "fun", "family", "dance"],
+    "sad": ["drama", "melancholy", "blues", "tragedy", "poetry"],
+    "melancholy": ["sad", "drama", "blues", "poetry"],
+    "dark": ["horror", "thriller", "mystery", "crime", "gothic", "metal"],
+    "spooky": ["horror", "mystery", "gothic", "halloween"],
+    "scary": ["horror", "thriller", "gothic"],
+    "adventurous": ["adventure", "action", "travel", "fantasy", "epic"],
+    "romantic": ["romance", "love", "jazz", "soul"],
+    "love": ["romance", "romantic", "soul"],
+    "energetic": ["action", "rock", "electronic", "dance", "hip-hop", "punk"],
+    "hype": ["energetic", "hip-hop", "electronic", "action"],
+    "focus": ["ambient", "instrumental", "classical", "science", "study"],
+    "study": ["focus", "instrumental", "ambient", "classical"],
+    "dreamy": ["dream pop", "ambient", "fantasy", "shoegaze", "synth"],
+    "epic": ["adventure", "fantasy", "war", "soundtrack"],
+    "funny": ["comedy", "humor", "fun"],
+    "mysterious": ["mystery", "thriller", "crime"],
+}
+EXPANSION_WEIGHT = 0.6
+
+KINDS = ("seed", "movie", "song", "book", "art")
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+_STOPWORDS = {"the", "and", "for", "with", "from", "that", "this", "into", "its", "of", "a", "an", "in", "on", "to", "me"}
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens plus adjacent-word bigrams ("science fiction")."""
+    words = [w for w in _WORD.findall((text or "").lower()) if w not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class VibeIndex:
+    """
+    Feature-hashed term vectors for every indexed movie, song, book and artwork.
+
+    Each item is a weighted bag of terms (genres, tags, subjects, title words)
+    hashed into `dim` signed buckets and L2-normalised, one row of a float32
+    matrix. A mood query is hashed the same way, so matching is one
+    matrix-vector product on the CPU. Rows are appended as pools index new
+    candidates; past `max_items` the oldest rows are overwritten.
+    """
+
+    def __init__(self, dim: int = 256, max_items: int = 20000):
+        self.dim = dim
+        self.max_items = max_items
+        self.matrix = np.zeros((64, dim), dtype=np.float32)
+        self.kinds = np.zeros(64, dtype=np.int8)
+        self.labels = []
+        self.ids = []
+        self.rows = {}
+        self.size = 0
+        self._next = 0
+        self.queries = 0
+
+    def vectorize(self, terms) -> np.ndarray:
+        """`terms` is an iterable of (text, weight); returns a unit vector (or zeros)."""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for text, weight in terms:
+            for token in tokenize(text):
+                h = zlib.crc32(token.encode())
+                vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _grow(self):
+        capacity = min(self.max_items, len(self.matrix) * 2)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        kinds = np.zeros(capacity, dtype=np.int8)
+        kinds[:self.size] = self.kinds[:self.size]
+        self.matrix, self.kinds = matrix, kinds
+
+    def add(self, kind: str, item_id, label: str, terms) -> int:
+        """Index (or re-index) one item; returns its row."""
+        key = (kind, item_id)
+        row = self.rows.get(key)
+        if row is None:
+            if self.size < self.max_items:
+                if self.size == len(self.matrix):
+                    self._grow()
+                row = self.size
+                self.size += 1
+                self.labels.append(label)
+                self.ids.append(key)
+            else:
+                # Full: reuse the oldest row
+                row = self._next
+                self._next = (self._next + 1) % self.max_items
+                del self.rows[self.ids[row]]
+                self.labels[row] = label
+                self.ids[row] = key
+            self.rows[key] = row
+        else:
+            self.labels[row] = label
+        self.matrix[row] = self.vectorize(terms)
+        self.kinds[row] = KINDS.index(kind)
+        return row
+
+    def query_vector(self, mood: str) -> np.ndarray:
+        terms = [(mood, 1.0)]
+        for token in tokenize(mood):
+            terms.extend((related, EXPANSION_WEIGHT) for related in MOOD_TERMS.get(token, ()))
+        return self.vectorize(terms)
+
+    def query(self, mood: str, per_kind: int = 1, candidates: int = 3, min_score: float = 0.15,
+              rng=None) -> list:
+        """
+        Best matches for a free-text mood: up to `per_kind` (kind, label, score)
+        per kind, each drawn at random from that kind's top `candidates` so the
+        same mood doesn't always return the same items. Scores below `min_score`
+        are hash-collision noise and never returned.
+        """
+        self.queries += 1
+        q = self.query_vector(mood)
+        if not self.size or not q.any():
+            return []
+        scores = self.matrix[:self.size] @ q
+        rng = rng or np.random.default_rng()
+        results = []
+        for code, kind in enumerate(KINDS):
+            rows = np.flatnonzero((self.kinds[:self.size] == code) & (scores >= min_score))
+            if not len(rows):
+                continue
+            top = rows[np.argsort(scores[rows])[::-1][:max(candidates, per_kind)]]
+            for row in rng.choice(top, size=min(per_kind, len(top)), replace=False):
+                results.append((kind, self.labels[row], float(scores[row])))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "items": self.size,
+            "max_items": self.max_items,
+            "dim": self.dim,
+            "bytes": self.matrix.nbytes + self.kinds.nbytes,
+            "queries": self.queries,
+            "kinds": {kind: int((self.kinds[:self.size] == code).sum()) for code, kind in enumerate(KINDS)},
+        }